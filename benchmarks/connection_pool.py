@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Connection Pool Benchmark - Updates/sec with pooled connections vs a connect per call
+
+    python benchmarks/connection_pool.py
+    python benchmarks/connection_pool.py --updates 20000 --users 500
+    python benchmarks/connection_pool.py --db /tmp/pool.db --keep
+
+Simulates the per-update database work (add_user, then get_user) against the
+pooled ConnectionManager and against a baseline that opens a new sqlite3
+connection for every call, like Database did before pooling. The profile cache
+is told to write on every update, so both sides do the same writes.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import Database
+
+class PerCallConnections:
+    """Baseline with ConnectionManager's interface: a fresh connection for every call"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def get(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    @contextmanager
+    def transaction(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def close_all(self):
+        pass
+
+def run(database: Database, user_ids: list) -> float:
+    """Do add_user + get_user for each id; returns updates/sec"""
+    database.profiles.clear()
+    database.profiles.touch_interval = 0
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        database.add_user(user_id, f"user{user_id}", f"First{user_id}")
+        database.get_user(user_id)
+    return len(user_ids) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled SQLite connections against connect-per-call")
+    parser.add_argument('--updates', type=int, default=10000, help="Simulated updates per run")
+    parser.add_argument('--users', type=int, default=500, help="Distinct users sending them")
+    parser.add_argument('--db', help="Database file to use (default: a temporary file)")
+    parser.add_argument('--keep', action='store_true', help="Keep the database file afterwards")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='bench-'), 'pool.db')
+    rng = random.Random(1)
+    user_ids = [rng.randint(1, args.users) for _ in range(args.updates)]
+
+    pooled = Database(path)
+    baseline = Database(path)
+    baseline.connections.close_all()
+    baseline.connections = PerCallConnections(path)
+
+    # Warm up both so the users exist and the file is in the page cache
+    run(pooled, user_ids[:500])
+    run(baseline, user_ids[:500])
+
+    print(f"{args.updates:,} updates (add_user + get_user) from {args.users:,} users:")
+    before = run(baseline, user_ids)
+    print(f"  connect per call            {before:10,.0f} updates/sec")
+    after = run(pooled, user_ids)
+    print(f"  pooled connections          {after:10,.0f} updates/sec  ({after / before:.1f}x)")
+
+    pooled.close()
+    if args.keep:
+        print(f"Kept {path}", file=sys.stderr)
+    elif not args.db:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(os.path.dirname(path))
+
+if __name__ == "__main__":
+    main()
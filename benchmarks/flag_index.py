@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Flag Index Benchmark - Memory and lookup cost of the admin/banned/pro index
+
+    python benchmarks/flag_index.py
+    python benchmarks/flag_index.py --users 1000000 --banned 20000 --pro 50000
+    python benchmarks/flag_index.py --db /tmp/users.db --keep
+
+Builds a synthetic users table, then reports the load query time, the index size
+next to a dict-per-user baseline, and per-lookup time for FlagIndex.flags()
+against a database read per user.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from iter_users import build_users
+from core.permissions import FlagIndex
+
+def timed(run, repeat: int = 5) -> float:
+    """Best wall time of repeat runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def traced(build):
+    """Build an object under tracemalloc; returns (object, bytes still allocated)"""
+    tracemalloc.start()
+    value = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flag index on a synthetic users table")
+    parser.add_argument('--users', type=int, default=1000000, help="Synthetic users to create")
+    parser.add_argument('--admins', type=int, default=100, help="Users with is_admin set")
+    parser.add_argument('--banned', type=int, default=20000, help="Users with is_banned set")
+    parser.add_argument('--pro', type=int, default=50000, help="Users with is_pro set")
+    parser.add_argument('--lookups', type=int, default=100000, help="Random ids to look up")
+    parser.add_argument('--db', help="Database file to build/reuse (default: a temporary file)")
+    parser.add_argument('--keep', action='store_true', help="Keep the database file afterwards")
+    parser.add_argument('--skip-baseline', action='store_true',
+                        help="Skip the dict-per-user baseline (needs ~250 MB at 1M users)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='bench-'), 'users.db')
+    database = build_users(path, args.users, args.admins, args.banned, args.pro)
+
+    print(f"{args.users:,} users ({args.admins:,} admins, {args.banned:,} banned, {args.pro:,} pro):")
+
+    rows = database.get_flagged_ids()
+    load_time = timed(database.get_flagged_ids)
+    print(f"  load query                  {load_time * 1000:8.1f} ms  ({len(rows):,} rows)")
+
+    def build_index():
+        index = FlagIndex()
+        index.load(rows)
+        return index
+
+    index, index_bytes = traced(build_index)
+    print(f"  index memory                {index_bytes / 1024 / 1024:8.2f} MB  "
+          f"({index.nbytes():,} bytes of ids)")
+
+    if not args.skip_baseline:
+        def build_dicts():
+            return {
+                record.id: {'is_admin': record.is_admin, 'is_banned': record.is_banned, 'is_pro': record.is_pro}
+                for record in database.iter_users(batch_size=5000)
+            }
+
+        users, dict_bytes = traced(build_dicts)
+        print(f"  dict per user               {dict_bytes / 1024 / 1024:8.2f} MB")
+        del users
+
+    rng = random.Random(2)
+    ids = [rng.randint(1, args.users) for _ in range(args.lookups)]
+
+    def index_lookups():
+        for user_id in ids:
+            index.flags(user_id)
+
+    per_lookup = timed(index_lookups) / len(ids)
+    print(f"  FlagIndex.flags()           {per_lookup * 1e6:8.2f} us per lookup")
+
+    db_ids = ids[:min(len(ids), 10000)]
+
+    def db_lookups():
+        for user_id in db_ids:
+            database.find_user(user_id)
+
+    per_read = timed(db_lookups, repeat=1) / len(db_ids)
+    print(f"  Database.find_user()        {per_read * 1e6:8.2f} us per lookup")
+
+    database.close()
+    if args.keep:
+        print(f"Kept {path}", file=sys.stderr)
+    elif not args.db:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(os.path.dirname(path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Iter Users Benchmark - Memory of streaming the users table vs loading it whole
+
+    python benchmarks/iter_users.py
+    python benchmarks/iter_users.py --users 200000 --batch-size 5000
+    python benchmarks/iter_users.py --db /tmp/users.db --keep
+
+Builds a synthetic users table in a scratch SQLite file, then reports the time and
+tracemalloc peak of get_all_users(), iter_users() and AsyncDatabase.iter_users().
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import Database
+from core.async_database import AsyncDatabase
+
+def synthetic_rows(count: int, admins: int = 0, banned: int = 0, pro: int = 0,
+                   seed: int = 1) -> Iterator[tuple]:
+    """UserRecord-ordered rows for ids 1..count, with the given number of each flag set"""
+    rng = random.Random(seed)
+    admin_ids = set(rng.sample(range(1, count + 1), min(admins, count)))
+    banned_ids = set(rng.sample(range(1, count + 1), min(banned, count)))
+    pro_ids = set(rng.sample(range(1, count + 1), min(pro, count)))
+
+    for user_id in range(1, count + 1):
+        yield (user_id, f"user{user_id}", f"First{user_id}", None,
+               int(user_id in admin_ids), int(user_id in banned_ids), int(user_id in pro_ids),
+               '2025-01-01 00:00:00', '2026-01-01 00:00:00')
+
+def build_users(path: str, count: int, admins: int = 0, banned: int = 0, pro: int = 0) -> Database:
+    """Create (or reuse, if it already has count users) a synthetic users database"""
+    database = Database(path)
+    existing = database.get_user_count()
+    if existing != count:
+        if existing:
+            database.execute('DELETE FROM users')
+        start = time.perf_counter()
+        database.import_users(synthetic_rows(count, admins, banned, pro), chunk_size=50000)
+        print(f"Built {count:,} users in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return database
+
+def measure(label: str, run: Callable[[], int]):
+    """Run once under tracemalloc and print rows, time and peak memory"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {rows:>10,} rows  {elapsed:6.2f}s  peak {peak / 1024 / 1024:8.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk user reads on a synthetic table")
+    parser.add_argument('--users', type=int, default=1000000, help="Synthetic users to create")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Rows per iter_users page")
+    parser.add_argument('--db', help="Database file to build/reuse (default: a temporary file)")
+    parser.add_argument('--keep', action='store_true', help="Keep the database file afterwards")
+    parser.add_argument('--skip-all', action='store_true', help="Skip get_all_users (needs ~400 MB at 1M users)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='bench-'), 'users.db')
+    database = build_users(path, args.users)
+    async_database = AsyncDatabase(database)
+
+    def all_users() -> int:
+        return len(database.get_all_users())
+
+    def stream() -> int:
+        return sum(1 for _ in database.iter_users(batch_size=args.batch_size))
+
+    def stream_async() -> int:
+        async def run():
+            count = 0
+            async for _ in async_database.iter_users(batch_size=args.batch_size):
+                count += 1
+            return count
+        return asyncio.run(run())
+
+    print(f"{args.users:,} users, {args.batch_size} rows per page:")
+    if not args.skip_all:
+        measure("get_all_users", all_users)
+    measure(f"iter_users({args.batch_size}/page)", stream)
+    measure("async iter_users", stream_async)
+
+    database.close()
+    if args.keep:
+        print(f"Kept {path}", file=sys.stderr)
+    elif not args.db:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(os.path.dirname(path))
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import asyncio
 import logging
 import importlib.util
 import os
+import signal
 from datetime import datetime
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -15,8 +16,9 @@ from aiogram.enums import ParseMode
 
 # Import core modules
 from core import (
-    load_config, db, load_admins,
-    create_bot, load_command_module
+    load_config, db, async_db, write_buffer, flag_cache, load_admins,
+    restriction_scheduler, change_feed, rate_limiter, update_scheduler, update_poller,
+    worker_pool, run_fetcher, create_bot, load_command_module
 )
 
 # Bot start time for uptime tracking
@@ -131,6 +133,50 @@ async def get_bot_info(token):
     except Exception as e:
         logging.error(f"Error getting bot info: {e}")
         return 'Unknown Bot'
+def configure_services(config: dict):
+    """Apply config to the core services and load permission state"""
+    write_buffer.configure(**config.get('write_buffer', {}))
+    flag_cache.configure(**config.get('permission_cache', {}))
+    change_feed.configure(**config.get('change_feed', {}))
+    rate_limiter.configure(**config.get('rate_limit', {}))
+    update_scheduler.configure(**config.get('scheduler', {}))
+    update_poller.configure(**config.get('polling', {}))
+
+    # Mark the change feed first so changes made while loading are replayed
+    change_feed.mark()
+    load_admins()
+
+    # Reload pending ban/mute expiries; the scheduler starts with the bot
+    restriction_scheduler.load()
+
+async def worker_main(index: int, queue, ready):
+    """Worker process: load every handler and serve updates sent by the fetcher"""
+    config = load_config()
+    setup_logging(config.get('log_level', 'INFO'))
+
+    # The fetcher already ran migrations and added config admins
+    db.configure(config.get('sqlite', {}))
+    configure_services(config)
+
+    bot = create_bot(config.get('token'))
+    load_commands()
+    load_events(bot.dp)
+
+    try:
+        await bot.start_worker(index, queue, ready)
+    finally:
+        db.close()
+
+def run_worker(index: int, queue, ready):
+    """Entry point of a worker process"""
+    # Ctrl+C and systemd's SIGTERM reach the whole process group; the worker keeps
+    # draining until the fetcher sends its stop marker (or exits)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        asyncio.run(worker_main(index, queue, ready))
+    except KeyboardInterrupt:
+        pass
 
 async def main():
     """Main function to start the bot"""
@@ -166,6 +212,7 @@ async def main():
         print("\033[32m🚀 Initializing core systems...\033[0m")
 
         # Initialize database
+        db.configure(config.get('sqlite', {}))
         db.init_database()
 
         # Load admins from config
@@ -174,7 +221,22 @@ async def main():
             from core.permissions import add_admin
             add_admin(admin_id)
 
-        load_admins()
+        configure_services(config)
+        worker_pool.configure(**config.get('workers', {}))
+        mode = config.get('mode', 'polling')
+
+        if worker_pool.processes > 1:
+            # Build deferred indexes in the background while the workers serve updates
+            online_migrations = asyncio.create_task(async_db.migrate_online())
+
+            print(f"\033[32m🧩 Starting {worker_pool.processes} worker processes ({mode} fetcher)...\033[0m")
+            try:
+                await run_fetcher(token, run_worker, mode=mode, webhook=config.get('webhook', {}))
+            finally:
+                online_migrations.cancel()
+                async_db.close()
+                db.close()
+            return
 
         print("\033[32m🤖 Creating bot instance...\033[0m")
 
@@ -189,11 +251,24 @@ async def main():
 
         print(f"\033[32m✅ Loaded {commands_loaded} command modules and {events_loaded} event modules\033[0m")
 
+        # Build deferred indexes in the background while the bot serves updates
+        online_migrations = asyncio.create_task(async_db.migrate_online())
+
         print("\033[32m🚀 KOMI HUB 2 Bot is starting...\033[0m")
-        print("\033[32m📡 Starting polling for updates...\033[0m")
 
         # Start the bot
-        await bot.start_polling()
+        try:
+            if mode == 'webhook':
+                webhook = config.get('webhook', {})
+                print(f"\033[32m🌐 Serving webhook on {webhook.get('host', '0.0.0.0')}:{webhook.get('port', 8080)}"
+                      f"{webhook.get('path', '/webhook')}...\033[0m")
+                await bot.start_webhook(**webhook)
+            else:
+                print("\033[32m📡 Starting polling for updates...\033[0m")
+                await bot.start_polling()
+        finally:
+            online_migrations.cancel()
+            db.close()
 
     except KeyboardInterrupt:
         print("\033[33m\n👋 Bot stopped by user (Ctrl+C)\033[0m")
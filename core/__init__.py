@@ -2,31 +2,54 @@
 Core Module - Clean, simple bot framework
 """
 
-from .database import db, Database
+from .database import db, Database, UserRecord
+from .async_database import async_db, AsyncDatabase
+from .write_buffer import write_buffer, WriteBehindBuffer
 from .command_handler import command_handler, command, load_all_commands
+from .restrictions import restriction_scheduler, RestrictionScheduler
 from .permissions import (
     is_admin, add_admin, remove_admin,
     is_banned, ban_user, unban_user,
+    is_muted, mute_user, unmute_user,
     is_pro, set_pro,
+    add_admin_async, remove_admin_async, ban_user_async, unban_user_async,
+    mute_user_async, unmute_user_async, set_pro_async,
+    ban_users, unban_users, add_admins, remove_admins, set_pro_users,
+    is_admin_async, is_banned_async, is_pro_async,
+    flag_cache, flag_index,
     admin_required, not_banned,
     load_admins
 )
+from .change_feed import change_feed, ChangeFeed
+from .update_scheduler import update_scheduler, UpdateScheduler
+from .webhook import WebhookServer, serve_webhook
+from .poller import update_poller, UpdatePoller
+from .process_pool import worker_pool, WorkerPool, run_fetcher
 from .hot_reload import hot_reloader, reload_commands, reload_events, reload_all, auto_reload
 from .utils import (
     load_config, save_config, create_keyboard,
     format_time, format_size, escape_html, escape_markdown,
-    get_user_mention, extract_args, extract_user_id,
+    get_user_mention, extract_args, extract_user_id, parse_duration,
     rate_limiter, get_uptime
 )
+from .callback_router import CallbackRouter
+from .force_join import force_join, is_force_join_enabled, get_force_channels
 from .translator import (
-    SimpleBot, create_bot, get_bot, Event,
+    SimpleBot, create_bot, get_bot, Context, Event, Pipeline,
     keyboard, CommandHandler, handler,
     send_message, register_command, load_command_module
 )
 
 __all__ = [
     # Database
-    'db', 'Database',
+    'db', 'Database', 'UserRecord',
+    'async_db', 'AsyncDatabase',
+    'write_buffer', 'WriteBehindBuffer',
+    'restriction_scheduler', 'RestrictionScheduler',
+    'change_feed', 'ChangeFeed',
+    'update_scheduler', 'UpdateScheduler',
+    'WebhookServer', 'serve_webhook', 'update_poller', 'UpdatePoller',
+    'worker_pool', 'WorkerPool', 'run_fetcher',
 
     # Command handling
     'command_handler', 'command', 'load_all_commands',
@@ -34,7 +57,13 @@ __all__ = [
     # Permissions
     'is_admin', 'add_admin', 'remove_admin',
     'is_banned', 'ban_user', 'unban_user',
+    'is_muted', 'mute_user', 'unmute_user',
     'is_pro', 'set_pro',
+    'add_admin_async', 'remove_admin_async', 'ban_user_async', 'unban_user_async',
+    'mute_user_async', 'unmute_user_async', 'set_pro_async',
+    'ban_users', 'unban_users', 'add_admins', 'remove_admins', 'set_pro_users',
+    'is_admin_async', 'is_banned_async', 'is_pro_async',
+    'flag_cache', 'flag_index',
     'admin_required', 'not_banned',
     'load_admins',
 
@@ -44,11 +73,14 @@ __all__ = [
     # Utils
     'load_config', 'save_config', 'create_keyboard',
     'format_time', 'format_size', 'escape_html', 'escape_markdown',
-    'get_user_mention', 'extract_args', 'extract_user_id',
+    'get_user_mention', 'extract_args', 'extract_user_id', 'parse_duration',
     'rate_limiter', 'get_uptime',
 
+    # Force join
+    'force_join', 'is_force_join_enabled', 'get_force_channels',
+
     # Simple Translator
-    'SimpleBot', 'create_bot', 'get_bot', 'Event',
+    'SimpleBot', 'create_bot', 'get_bot', 'Context', 'Event', 'Pipeline', 'CallbackRouter',
     'keyboard', 'CommandHandler', 'handler',
     'send_message', 'register_command', 'load_command_module'
 ]
@@ -0,0 +1,135 @@
+"""
+Async Database - Non-blocking wrapper around the SQLite database
+Writes go through one dedicated writer thread, reads through a small thread pool,
+so disk I/O never stalls the aiogram event loop.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime
+from typing import Optional, Dict, List, Callable, Any, AsyncIterator
+
+from .database import db, Database, UserRecord
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """Async counterpart of Database"""
+
+    def __init__(self, database: Database, readers: int = 4):
+        self.db = database
+        self.readers = readers
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._reader_pool: Optional[ThreadPoolExecutor] = None
+
+    def _executors(self):
+        """Create thread pools on first use"""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+            self._reader_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="db-reader")
+        return self._writer, self._reader_pool
+
+    async def write(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a write on the writer thread"""
+        writer, _ = self._executors()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(writer, partial(func, *args, **kwargs))
+
+    async def read(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a read on the reader pool"""
+        _, readers = self._executors()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(readers, partial(func, *args, **kwargs))
+
+    async def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+        """Add or update user"""
+        await self.write(self.db.add_user, user_id, username, first_name, last_name)
+
+    async def get_user(self, user_id: int) -> Optional[UserRecord]:
+        """Get user data"""
+        return await self.read(self.db.get_user, user_id)
+
+    async def find_user(self, user_id: int) -> Optional[UserRecord]:
+        """Get user data; None means no such user, errors are raised"""
+        return await self.read(self.db.find_user, user_id)
+
+    async def set_admin(self, user_id: int, is_admin: bool = True):
+        """Set user admin status"""
+        await self.write(self.db.set_admin, user_id, is_admin)
+
+    async def set_ban(self, user_id: int, is_banned: bool = True):
+        """Set user ban status"""
+        await self.write(self.db.set_ban, user_id, is_banned)
+
+    async def set_pro(self, user_id: int, is_pro: bool = True):
+        """Set user pro status"""
+        await self.write(self.db.set_pro, user_id, is_pro)
+
+    async def get_all_users(self) -> List[UserRecord]:
+        """Get all users"""
+        return await self.read(self.db.get_all_users)
+
+    async def get_user_count(self) -> int:
+        """Get total user count"""
+        return await self.read(self.db.get_user_count)
+
+    async def iter_users(self, batch_size: int = 1000, banned: bool = None,
+                         seen_since: datetime = None) -> AsyncIterator[UserRecord]:
+        """Stream user rows page by page, each page fetched on the reader pool"""
+        after_id = None
+
+        while True:
+            rows = await self.read(self.db.get_users_page, after_id, batch_size, banned, seen_since)
+            if not rows:
+                return
+
+            for row in rows:
+                yield row
+
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    async def get_admins(self) -> List[UserRecord]:
+        """Get all admins"""
+        return await self.read(self.db.get_admins)
+
+    async def get_banned_users(self) -> List[UserRecord]:
+        """Get all banned users"""
+        return await self.read(self.db.get_banned_users)
+
+    async def get_pro_users(self) -> List[UserRecord]:
+        """Get all pro users"""
+        return await self.read(self.db.get_pro_users)
+
+    async def get_stats(self) -> Dict[str, int]:
+        """Get the maintained user, admin, banned, pro and command counters"""
+        return await self.read(self.db.get_stats)
+
+    async def get_command_stats(self, limit: int = None) -> List[tuple]:
+        """Get (command, uses, last_used) rows, most used first"""
+        return await self.read(self.db.get_command_stats, limit)
+
+    async def migrate_online(self) -> int:
+        """Apply deferred online migrations one per writer job, so queued writes
+        get the writer between index builds"""
+        applied = 0
+        try:
+            while await self.write(self.db.migrate, True, 1):
+                applied += 1
+        except Exception as e:
+            logger.error(f"Online migration error: {e}")
+        return applied
+
+    def close(self):
+        """Wait for pending work and stop the thread pools"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._reader_pool.shutdown(wait=True)
+            self._writer = None
+            self._reader_pool = None
+
+# Global async database instance
+async_db = AsyncDatabase(db)
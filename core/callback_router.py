@@ -0,0 +1,122 @@
+"""
+Callback Router - Maps callback data to handlers in one lookup
+Exact strings live in a dict; patterns such as "ttt_{game}_{r:int}_{c:int}" are
+split on "_" into a segment trie, so matching costs one dict probe per segment
+no matter how many callbacks are registered.
+"""
+
+import logging
+from typing import Dict, Callable, Optional, Tuple, List, Any
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = '_'
+
+# Converters usable as {name:type} in patterns
+CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    'str': str,
+    'int': int,
+}
+
+class _Node:
+    """One trie level: literal children, at most one parameter child, and a route ending here"""
+
+    __slots__ = ('children', 'param', 'route')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.param: Optional['_Node'] = None
+        self.route: Optional[tuple] = None
+
+def parse_pattern(pattern: str) -> List[tuple]:
+    """Split a pattern into ('literal', text) and ('param', name, converter) segments"""
+    segments = []
+    for segment in pattern.split(SEPARATOR):
+        if segment.startswith('{') and segment.endswith('}'):
+            name, _, type_name = segment[1:-1].partition(':')
+            if type_name and type_name not in CONVERTERS:
+                raise ValueError(f"Unknown parameter type '{type_name}' in callback pattern '{pattern}'")
+            segments.append(('param', name, CONVERTERS[type_name or 'str']))
+        else:
+            segments.append(('literal', segment))
+    return segments
+
+class CallbackRouter:
+    """Routes callback data to handlers; literal segments win over parameters"""
+
+    def __init__(self):
+        self.exact: Dict[str, Callable] = {}
+        self.root = _Node()
+        self.patterns: Dict[str, Callable] = {}
+
+    def add(self, pattern: str, func: Callable):
+        """Register a handler for exact data or a {param} pattern; re-adding replaces it"""
+        if pattern in self.exact or pattern in self.patterns:
+            logger.info(f"Callback '{pattern}' re-registered")
+
+        if '{' not in pattern:
+            self.exact[pattern] = func
+            return
+
+        segments = parse_pattern(pattern)
+        node = self.root
+        for segment in segments:
+            if segment[0] == 'literal':
+                node = node.children.setdefault(segment[1], _Node())
+            else:
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+
+        params = tuple((segment[1], segment[2]) for segment in segments if segment[0] == 'param')
+        node.route = (pattern, func, params)
+        self.patterns[pattern] = func
+
+    def match(self, data: str) -> Optional[Tuple[str, Callable, Dict[str, Any]]]:
+        """Find (pattern, handler, params) for callback data, or None"""
+        func = self.exact.get(data)
+        if func is not None:
+            return data, func, {}
+
+        if not self.patterns:
+            return None
+        return self._walk(self.root, data.split(SEPARATOR), 0, [])
+
+    def _walk(self, node: _Node, segments: List[str], index: int, values: List[str]):
+        """Depth-first trie walk, trying the literal child before the parameter child"""
+        if index == len(segments):
+            if node.route is None:
+                return None
+
+            pattern, func, params = node.route
+            try:
+                parsed = {name: convert(value) for (name, convert), value in zip(params, values)}
+            except ValueError:
+                return None
+            return pattern, func, parsed
+
+        segment = segments[index]
+        child = node.children.get(segment)
+        if child is not None:
+            found = self._walk(child, segments, index + 1, values)
+            if found:
+                return found
+
+        if node.param is not None and segment:
+            values.append(segment)
+            found = self._walk(node.param, segments, index + 1, values)
+            values.pop()
+            if found:
+                return found
+
+        return None
+
+    def filter(self, callback) -> Any:
+        """aiogram filter: passes the matched route to the handler, or lets the update through"""
+        route = self.match(callback.data or '')
+        if route is None:
+            return False
+        return {'callback_route': route}
+
+    def __len__(self) -> int:
+        return len(self.exact) + len(self.patterns)
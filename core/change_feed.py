@@ -0,0 +1,144 @@
+"""
+Change Feed - Keeps permission caches in sync across processes sharing bot.db
+Triggers log every flag and restriction change to the changes table. Each process
+checks PRAGMA data_version (no I/O unless someone else committed) and replays only
+the new rows, invalidating just the users they touch.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from .async_database import async_db, AsyncDatabase
+from .permissions import flag_cache, flag_index, load_admins, ADMIN, BANNED, PRO
+from .restrictions import restriction_scheduler
+
+logger = logging.getLogger(__name__)
+
+class ChangeFeed:
+    """Polls the changes table and applies other processes' changes to local caches"""
+
+    def __init__(self, database: AsyncDatabase, interval_ms: int = 1000, keep_rows: int = 100000,
+                 batch_size: int = 10000):
+        self.database = database
+        self.interval_ms = interval_ms
+        self.keep_rows = keep_rows
+        self.batch_size = batch_size
+
+        self.last_seq = 0
+        self.version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.polls = 0
+        self.applied = 0
+        self.reloads = 0
+
+    def configure(self, interval_ms: int = None, keep_rows: int = None):
+        """Apply settings from config"""
+        if interval_ms is not None:
+            self.interval_ms = interval_ms
+        if keep_rows is not None:
+            self.keep_rows = keep_rows
+
+    def mark(self):
+        """Remember the current feed position; call before loading the caches"""
+        self.last_seq = self.database.db.get_last_change_seq()
+        self.version = self.database.db.data_version()
+
+    def apply(self, rows) -> int:
+        """Apply change rows to the flag cache/index and restriction scheduler"""
+        for seq, user_id, kind, flags, expires_at, removed in rows:
+            if kind == 'flags':
+                flag_cache.invalidate(user_id)
+                if flag_index.loaded:
+                    for position in (ADMIN, BANNED, PRO):
+                        flag_index.set(position, user_id, bool(flags >> position & 1))
+            elif removed:
+                restriction_scheduler.untrack(user_id, kind)
+            else:
+                restriction_scheduler.track(user_id, kind, expires_at)
+
+            self.last_seq = seq
+
+        self.applied += len(rows)
+        return len(rows)
+
+    async def reload(self):
+        """Rebuild all caches after falling behind the pruned feed"""
+        self.reloads += 1
+        logger.warning(f"Change feed fell behind at seq {self.last_seq}, reloading permissions")
+        last_seq = await self.database.read(self.database.db.get_last_change_seq)
+        if not load_admins():
+            # Keep the old position so the next poll notices the gap and retries
+            self.version = None
+            return
+        self.last_seq = last_seq
+        restriction_scheduler.load()
+
+    async def poll(self) -> int:
+        """Apply any changes committed since the last poll"""
+        self.polls += 1
+
+        # Cheap check on this thread's connection: unchanged means nobody else committed
+        version = self.database.db.data_version()
+        if version == self.version:
+            return 0
+        self.version = version
+
+        applied = 0
+        while True:
+            rows = await self.database.read(self.database.db.get_changes, self.last_seq, self.batch_size)
+            if not rows:
+                break
+
+            if rows[0][0] > self.last_seq + 1:
+                await self.reload()
+                return applied
+
+            applied += self.apply(rows)
+            if len(rows) < self.batch_size:
+                break
+
+        return applied
+
+    async def _run(self):
+        """Poll loop; also trims the feed now and then"""
+        while True:
+            await asyncio.sleep(self.interval_ms / 1000)
+            try:
+                await self.poll()
+                if self.polls % 60 == 0:
+                    await self.database.write(self.database.db.prune_changes, self.keep_rows)
+            except Exception as e:
+                logger.error(f"Change feed error: {e}")
+
+    def start(self):
+        """Start the poll loop"""
+        if self._task is None:
+            if self.version is None:
+                self.mark()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Change feed started at seq {self.last_seq} ({self.interval_ms}ms)")
+
+    async def stop(self):
+        """Stop the poll loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        """Get feed metrics"""
+        return {
+            'last_seq': self.last_seq,
+            'polls': self.polls,
+            'applied': self.applied,
+            'reloads': self.reloads
+        }
+
+# Global change feed
+change_feed = ChangeFeed(async_db)
@@ -11,8 +11,8 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from .database import db
-from .permissions import is_admin, is_banned
+from .write_buffer import write_buffer
+from .permissions import is_admin, is_admin_async, is_banned_async, is_muted
 
 logger = logging.getLogger(__name__)
 
@@ -50,15 +50,19 @@ class CommandHandler:
             
             # Add user to database
             if user:
-                db.add_user(user.id, user.username, user.first_name, user.last_name)
+                write_buffer.add_user(user.id, user.username, user.first_name, user.last_name)
             
             # Check if user is banned
-            if user and is_banned(user.id):
+            if user and await is_banned_async(user.id):
                 await message.reply("❌ You are banned from using this bot.")
                 return
             
+            # Muted users are ignored silently
+            if user and is_muted(user.id):
+                return
+            
             # Check admin requirement
-            if command_info['admin_only'] and not is_admin(user.id):
+            if command_info['admin_only'] and not await is_admin_async(user.id if user else None):
                 await message.reply("❌ This command is for admins only.")
                 return
             
@@ -68,6 +72,7 @@ class CommandHandler:
                 return
             
             # Execute command
+            write_buffer.count_command(command_name)
             await command_info['handler'](message)
             logger.info(f"Command '{command_name}' executed by user {user.id if user else 'unknown'}")
             
@@ -4,179 +4,620 @@ Database Handler - Simple SQLite database for user management
 
 import sqlite3
 import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Any, Iterator, Iterable, Callable
+
+from .migrations import run_migrations, get_version, get_pending
 
 logger = logging.getLogger(__name__)
 
+# Pragmas applied to every connection (override via "sqlite" in config.json)
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -8000,        # negative = KiB, so ~8 MB page cache
+    "mmap_size": 67108864,      # 64 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+class ConnectionManager:
+    """Keeps one long-lived SQLite connection per thread"""
+
+    def __init__(self, db_path: str, pragmas: Dict[str, Any] = None, cached_statements: int = 256,
+                 setup: Callable[[sqlite3.Connection], Any] = None):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        self.pragmas.update(pragmas or {})
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        # One-time hook run on the first connection; it clears itself by setting setup = None
+        self.setup = setup
+        self._setup_lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        """Open a new connection and apply pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+
+        for name, value in self.pragmas.items():
+            if not name.isidentifier() or not str(value).lstrip('-').isalnum():
+                logger.warning(f"Ignoring invalid pragma {name}={value!r}")
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+
+        with self._lock:
+            self._connections.append(conn)
+
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """Get the connection owned by the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            if self.setup is not None:
+                with self._setup_lock:
+                    if self.setup is not None:
+                        self.setup(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block inside a single transaction on this thread's connection"""
+        conn = self.get()
+        with conn:
+            yield conn
+
+    def configure(self, pragmas: Dict[str, Any]):
+        """Change pragmas; connections are reopened lazily with the new values"""
+        self.pragmas.update(pragmas or {})
+        self.close_all()
+
+    def close_all(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error closing database connection: {e}")
+
+        # Drop stale references so each thread reconnects on next use
+        self._local = threading.local()
+
+# Upsert that only touches profile columns, keeping flags and join_date intact
+UPSERT_USER_SQL = '''
+    INSERT INTO users (id, username, first_name, last_name, last_seen)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        username = excluded.username,
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        last_seen = excluded.last_seen
+'''
+
+TOUCH_USER_SQL = 'UPDATE users SET last_seen = ? WHERE id = ?'
+
+# Bulk import merges into existing rows: newest profile, flags OR'd, earliest join
+IMPORT_USER_SQL = '''
+    INSERT INTO users (id, username, first_name, last_name, is_admin, is_banned, is_pro, join_date, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+    ON CONFLICT(id) DO UPDATE SET
+        username = COALESCE(excluded.username, username),
+        first_name = COALESCE(excluded.first_name, first_name),
+        last_name = COALESCE(excluded.last_name, last_name),
+        is_admin = MAX(is_admin, excluded.is_admin),
+        is_banned = MAX(is_banned, excluded.is_banned),
+        is_pro = MAX(is_pro, excluded.is_pro),
+        join_date = MIN(join_date, excluded.join_date),
+        last_seen = MAX(last_seen, excluded.last_seen)
+'''
+
+# Flag columns that have a partial index and can be queried by role
+FLAG_COLUMNS = ('is_admin', 'is_banned', 'is_pro')
+
+SET_FLAG_SQL = '''
+    INSERT INTO users (id, {column}) VALUES (?, ?)
+    ON CONFLICT(id) DO UPDATE SET {column} = excluded.{column}
+'''
+
+# Kinds of row in the restrictions table
+RESTRICTION_KINDS = ('ban', 'mute')
+
+SET_RESTRICTION_SQL = '''
+    INSERT INTO restrictions (user_id, kind, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT(user_id, kind) DO UPDATE SET expires_at = excluded.expires_at, created_at = CURRENT_TIMESTAMP
+'''
+CLEAR_RESTRICTION_SQL = 'DELETE FROM restrictions WHERE user_id = ? AND kind = ?'
+
+class UserRecord(tuple):
+    """Compact read-only users row with attribute and dict-style access"""
+
+    __slots__ = ()
+
+    FIELDS = ('id', 'username', 'first_name', 'last_name',
+              'is_admin', 'is_banned', 'is_pro', 'join_date', 'last_seen')
+    _INDEX = {name: index for index, name in enumerate(FIELDS)}
+
+    @classmethod
+    def from_row(cls, cursor: sqlite3.Cursor, row: tuple) -> 'UserRecord':
+        """sqlite3 row factory"""
+        return cls(row)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                index = self._INDEX[key]
+            except KeyError:
+                raise KeyError(key) from None
+            value = tuple.__getitem__(self, index)
+            return bool(value) if key in FLAG_COLUMNS else value
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._INDEX
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style get"""
+        return self[key] if key in self._INDEX else default
+
+    def keys(self) -> tuple:
+        """Field names, like dict.keys()"""
+        return self.FIELDS
+
+    def to_dict(self) -> Dict:
+        """Convert to a plain dict"""
+        return {name: self[name] for name in self.FIELDS}
+
+    id = property(lambda self: tuple.__getitem__(self, 0))
+    username = property(lambda self: tuple.__getitem__(self, 1))
+    first_name = property(lambda self: tuple.__getitem__(self, 2))
+    last_name = property(lambda self: tuple.__getitem__(self, 3))
+    is_admin = property(lambda self: bool(tuple.__getitem__(self, 4)))
+    is_banned = property(lambda self: bool(tuple.__getitem__(self, 5)))
+    is_pro = property(lambda self: bool(tuple.__getitem__(self, 6)))
+    join_date = property(lambda self: tuple.__getitem__(self, 7))
+    last_seen = property(lambda self: tuple.__getitem__(self, 8))
+
+# Explicit column list so added columns never shift UserRecord fields
+USER_COLUMNS = ', '.join(UserRecord.FIELDS)
+
+class ProfileCache:
+    """LRU of recently written (username, first_name, last_name) per user"""
+
+    SKIP = 0      # profile unchanged and last_seen is fresh enough
+    TOUCH = 1     # profile unchanged, only last_seen needs refreshing
+    UPSERT = 2    # new user or changed profile
+
+    def __init__(self, max_size: int = 10000, touch_interval: float = 300):
+        self.max_size = max_size
+        self.touch_interval = touch_interval
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, user_id: int, profile: tuple) -> int:
+        """Decide what write a user update needs and remember it as written"""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+
+            if entry and entry[0] == profile:
+                self._entries.move_to_end(user_id)
+                if now - entry[1] < self.touch_interval:
+                    return self.SKIP
+                self._entries[user_id] = (profile, now)
+                return self.TOUCH
+
+            self._entries[user_id] = (profile, now)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            return self.UPSERT
+
+    def forget(self, user_id: int):
+        """Drop a user so the next update is written in full"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
 class Database:
-    def __init__(self, db_path: str = "bot.db"):
+    def __init__(self, db_path: str = "bot.db", pragmas: Dict[str, Any] = None, lazy: bool = False):
         self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
+        self.connections = ConnectionManager(db_path, pragmas, setup=self.init_database if lazy else None)
+        self.profiles = ProfileCache()
+        if not lazy:
+            self.init_database()
+
+    def configure(self, pragmas: Dict[str, Any]):
+        """Apply pragma settings from config"""
+        self.connections.configure(pragmas)
+        logger.info(f"Database pragmas: {self.connections.pragmas}")
+
+    def close(self):
+        """Close all pooled connections"""
+        self.connections.close_all()
+
+    def execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Execute a raw query on the pooled connection and commit"""
+        with self.connections.transaction() as conn:
+            return conn.execute(query, params)
+
+    def init_database(self, conn: sqlite3.Connection = None):
         """Initialize database tables"""
+        self.connections.setup = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    is_admin INTEGER DEFAULT 0,
-                    is_banned INTEGER DEFAULT 0,
-                    is_pro INTEGER DEFAULT 0,
-                    join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Chat settings table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS chat_settings (
-                    chat_id INTEGER PRIMARY KEY,
-                    chat_title TEXT,
-                    welcome_enabled INTEGER DEFAULT 1,
-                    rules_text TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Bot statistics table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bot_stats (
-                    id INTEGER PRIMARY KEY,
-                    total_users INTEGER DEFAULT 0,
-                    total_commands INTEGER DEFAULT 0,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
-            logger.info("Database initialized successfully")
-            
+            applied = run_migrations(conn or self.connections.get())
+            logger.info(f"Database initialized successfully ({applied} migrations applied)")
+
         except Exception as e:
             logger.error(f"Database initialization error: {e}")
-    
+
+    def migrate(self, online: bool = False, limit: int = None) -> int:
+        """Apply pending migrations, including deferred online ones if requested"""
+        return run_migrations(self.connections.get(), online=online, limit=limit)
+
+    def get_schema_version(self) -> int:
+        """Get the applied schema version (highest with no pending migration below it)"""
+        return get_version(self.connections.get())
+
+    def get_pending_migrations(self) -> List[int]:
+        """Get versions of migrations not applied yet, e.g. deferred online ones"""
+        return [migration.version for migration in get_pending(self.connections.get())]
+
     def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
         """Add or update user"""
+        action = self.profiles.check(user_id, (username, first_name, last_name))
+        if action == ProfileCache.SKIP:
+            return
+
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO users (id, username, first_name, last_name, last_seen)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, username, first_name, last_name, datetime.now()))
-            
-            conn.commit()
-            conn.close()
-            
+            with self.connections.transaction() as conn:
+                if action == ProfileCache.TOUCH:
+                    conn.execute(TOUCH_USER_SQL, (datetime.now(), user_id))
+                else:
+                    conn.execute(UPSERT_USER_SQL, (user_id, username, first_name, last_name, datetime.now()))
+
         except Exception as e:
+            self.profiles.forget(user_id)
             logger.error(f"Error adding user {user_id}: {e}")
-    
-    def get_user(self, user_id: int) -> Optional[Dict]:
+
+    def write_batch(self, rows: List[tuple], touches: List[tuple] = (), commands: Dict[str, int] = None):
+        """Write (id, username, first_name, last_name, last_seen) rows,
+        (last_seen, id) touches and command use counts in one transaction"""
+        with self.connections.transaction() as conn:
+            if rows:
+                conn.executemany(UPSERT_USER_SQL, rows)
+            if touches:
+                conn.executemany(TOUCH_USER_SQL, touches)
+            if commands:
+                now = datetime.now()
+                conn.executemany('''
+                    INSERT INTO command_stats (command, uses, last_used) VALUES (?, ?, ?)
+                    ON CONFLICT(command) DO UPDATE SET
+                        uses = uses + excluded.uses,
+                        last_used = excluded.last_used
+                ''', [(name, uses, now) for name, uses in commands.items()])
+                conn.execute(
+                    'UPDATE bot_stats SET total_commands = total_commands + ?, last_updated = ? WHERE id = 1',
+                    (sum(commands.values()), now)
+                )
+
+    def _user_cursor(self) -> sqlite3.Cursor:
+        """Cursor on this thread's connection that builds UserRecord rows"""
+        cursor = self.connections.get().cursor()
+        cursor.row_factory = UserRecord.from_row
+        return cursor
+
+    def import_users(self, rows: Iterable[tuple], chunk_size: int = 10000) -> int:
+        """Bulk load UserRecord-ordered tuples with executemany, one transaction per chunk"""
+        imported = 0
+        chunk = []
+
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                with self.connections.transaction() as conn:
+                    conn.executemany(IMPORT_USER_SQL, chunk)
+                imported += len(chunk)
+                chunk = []
+
+        if chunk:
+            with self.connections.transaction() as conn:
+                conn.executemany(IMPORT_USER_SQL, chunk)
+            imported += len(chunk)
+
+        self.profiles.clear()
+        return imported
+
+    def find_user(self, user_id: int) -> Optional[UserRecord]:
+        """Get user data; None means no such user, errors are raised"""
+        return self._user_cursor().execute(
+            f'SELECT {USER_COLUMNS} FROM users WHERE id = ?', (user_id,)
+        ).fetchone()
+
+    def get_user(self, user_id: int) -> Optional[UserRecord]:
         """Get user data"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                return {
-                    'id': row[0], 'username': row[1], 'first_name': row[2], 'last_name': row[3],
-                    'is_admin': bool(row[4]), 'is_banned': bool(row[5]), 'is_pro': bool(row[6]),
-                    'join_date': row[7], 'last_seen': row[8]
-                }
-            return None
-            
+            return self.find_user(user_id)
+
         except Exception as e:
             logger.error(f"Error getting user {user_id}: {e}")
             return None
-    
+
+    def _set_flag(self, column: str, user_id: int, value: bool, conn: sqlite3.Connection = None):
+        """Set a flag, creating the user row if the bot has not seen them yet"""
+        if column not in FLAG_COLUMNS:
+            raise ValueError(f"Unknown flag column: {column}")
+
+        query = SET_FLAG_SQL.format(column=column)
+        if conn is not None:
+            conn.execute(query, (user_id, int(value)))
+            return
+
+        with self.connections.transaction() as conn:
+            conn.execute(query, (user_id, int(value)))
+
     def set_admin(self, user_id: int, is_admin: bool = True):
-        """Set user admin status"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('UPDATE users SET is_admin = ? WHERE id = ?', (int(is_admin), user_id))
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error setting admin status for {user_id}: {e}")
-    
-    def set_ban(self, user_id: int, is_banned: bool = True):
-        """Set user ban status"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('UPDATE users SET is_banned = ? WHERE id = ?', (int(is_banned), user_id))
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error setting ban status for {user_id}: {e}")
-    
+        """Set user admin status; raises on error so callers never cache an unwritten change"""
+        self._set_flag('is_admin', user_id, is_admin)
+
+    def set_ban(self, user_id: int, is_banned: bool = True, expires_at: float = None):
+        """Set user ban status; a ban with expires_at (unix time) is recorded as a timed restriction.
+        Raises on error."""
+        with self.connections.transaction() as conn:
+            self._set_flag('is_banned', user_id, is_banned, conn)
+            if is_banned and expires_at is not None:
+                conn.execute(SET_RESTRICTION_SQL, (user_id, 'ban', expires_at))
+            else:
+                conn.execute(CLEAR_RESTRICTION_SQL, (user_id, 'ban'))
+
     def set_pro(self, user_id: int, is_pro: bool = True):
-        """Set user pro status"""
+        """Set user pro status; raises on error"""
+        self._set_flag('is_pro', user_id, is_pro)
+
+    def set_flag_many(self, column: str, user_ids: List[int], value: bool, expires_at: float = None) -> int:
+        """Set a flag for many users in one transaction. For is_banned, expires_at
+        records timed bans, and otherwise any timed ban is cleared."""
+        if column not in FLAG_COLUMNS:
+            raise ValueError(f"Unknown flag column: {column}")
+
+        with self.connections.transaction() as conn:
+            conn.executemany(SET_FLAG_SQL.format(column=column), ((user_id, int(value)) for user_id in user_ids))
+            if column == 'is_banned':
+                if value and expires_at is not None:
+                    conn.executemany(SET_RESTRICTION_SQL, ((user_id, 'ban', expires_at) for user_id in user_ids))
+                else:
+                    conn.executemany(CLEAR_RESTRICTION_SQL, ((user_id, 'ban') for user_id in user_ids))
+        return len(user_ids)
+
+    def set_restriction(self, user_id: int, kind: str, expires_at: float = None):
+        """Record a restriction (mute), permanent when expires_at is None"""
+        if kind not in RESTRICTION_KINDS:
+            raise ValueError(f"Unknown restriction kind: {kind}")
+
+        with self.connections.transaction() as conn:
+            conn.execute(SET_RESTRICTION_SQL, (user_id, kind, expires_at))
+
+    def clear_restriction(self, user_id: int, kind: str):
+        """Remove a restriction"""
+        with self.connections.transaction() as conn:
+            conn.execute(CLEAR_RESTRICTION_SQL, (user_id, kind))
+
+    def lift_restriction(self, user_id: int, kind: str, expires_at: float) -> bool:
+        """Lift an expired restriction, unless it was replaced or removed meanwhile"""
+        with self.connections.transaction() as conn:
+            lifted = conn.execute(
+                'DELETE FROM restrictions WHERE user_id = ? AND kind = ? AND expires_at = ?',
+                (user_id, kind, expires_at)
+            ).rowcount
+
+            if lifted and kind == 'ban':
+                self._set_flag('is_banned', user_id, False, conn)
+        return bool(lifted)
+
+    def get_restrictions(self) -> List[tuple]:
+        """Get all (user_id, kind, expires_at) restrictions, soonest expiry first"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('UPDATE users SET is_pro = ? WHERE id = ?', (int(is_pro), user_id))
-            conn.commit()
-            conn.close()
-            
+            return self.connections.get().execute(
+                'SELECT user_id, kind, expires_at FROM restrictions ORDER BY expires_at'
+            ).fetchall()
+
         except Exception as e:
-            logger.error(f"Error setting pro status for {user_id}: {e}")
-    
-    def get_all_users(self) -> List[Dict]:
+            logger.error(f"Error getting restrictions: {e}")
+            return []
+
+    def data_version(self) -> int:
+        """PRAGMA data_version of this thread's connection; it changes whenever
+        another connection (or process) commits"""
+        return self.connections.get().execute('PRAGMA data_version').fetchone()[0]
+
+    def get_last_change_seq(self) -> int:
+        """Get the newest change feed sequence number"""
+        return self.connections.get().execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def get_changes(self, after_seq: int, limit: int = 10000) -> List[tuple]:
+        """Get (seq, user_id, kind, flags, expires_at, removed) change rows after a sequence number"""
+        return self.connections.get().execute(
+            'SELECT seq, user_id, kind, flags, expires_at, removed FROM changes WHERE seq > ? ORDER BY seq LIMIT ?',
+            (after_seq, limit)
+        ).fetchall()
+
+    def prune_changes(self, keep_rows: int) -> int:
+        """Drop all but the newest keep_rows change rows"""
+        with self.connections.transaction() as conn:
+            return conn.execute(
+                'DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?', (keep_rows,)
+            ).rowcount
+
+    def get_all_users(self) -> List[UserRecord]:
         """Get all users"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM users')
-            rows = cursor.fetchall()
-            conn.close()
-            
-            users = []
-            for row in rows:
-                users.append({
-                    'id': row[0], 'username': row[1], 'first_name': row[2], 'last_name': row[3],
-                    'is_admin': bool(row[4]), 'is_banned': bool(row[5]), 'is_pro': bool(row[6]),
-                    'join_date': row[7], 'last_seen': row[8]
-                })
-            
-            return users
-            
+            return self._user_cursor().execute(f'SELECT {USER_COLUMNS} FROM users').fetchall()
+
         except Exception as e:
             logger.error(f"Error getting all users: {e}")
             return []
-    
+
     def get_user_count(self) -> int:
         """Get total user count"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT COUNT(*) FROM users')
-            count = cursor.fetchone()[0]
-            conn.close()
-            
-            return count
-            
+            return self.connections.get().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
         except Exception as e:
             logger.error(f"Error getting user count: {e}")
             return 0
 
-# Global database instance
-db = Database()
+    def get_users_page(self, after_id: int = None, limit: int = 1000, banned: bool = None,
+                       seen_since: datetime = None) -> List[UserRecord]:
+        """Get the next page of user rows ordered by id (keyset pagination)"""
+        conditions = []
+        params = []
+
+        if after_id is not None:
+            conditions.append('id > ?')
+            params.append(after_id)
+        if banned is not None:
+            conditions.append('is_banned = ?')
+            params.append(int(banned))
+        if seen_since is not None:
+            conditions.append('last_seen >= ?')
+            params.append(seen_since)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        params.append(limit)
+
+        return self._user_cursor().execute(
+            f'SELECT {USER_COLUMNS} FROM users {where} ORDER BY id LIMIT ?', params
+        ).fetchall()
+
+    def iter_users(self, batch_size: int = 1000, banned: bool = None,
+                   seen_since: datetime = None) -> Iterator[UserRecord]:
+        """Stream user rows page by page, keeping memory flat regardless of table size"""
+        after_id = None
+
+        while True:
+            rows = self.get_users_page(after_id, batch_size, banned, seen_since)
+            if not rows:
+                return
+
+            yield from rows
+
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    def get_users_with_flag(self, column: str) -> List[UserRecord]:
+        """Get users with a flag set, using the partial index on that flag"""
+        if column not in FLAG_COLUMNS:
+            raise ValueError(f"Unknown flag column: {column}")
+
+        try:
+            return self._user_cursor().execute(
+                f'SELECT {USER_COLUMNS} FROM users WHERE {column} = 1'
+            ).fetchall()
+
+        except Exception as e:
+            logger.error(f"Error getting users with {column}: {e}")
+            return []
+
+    def get_admins(self) -> List[UserRecord]:
+        """Get all admins"""
+        return self.get_users_with_flag('is_admin')
+
+    def get_banned_users(self) -> List[UserRecord]:
+        """Get all banned users"""
+        return self.get_users_with_flag('is_banned')
+
+    def get_pro_users(self) -> List[UserRecord]:
+        """Get all pro users"""
+        return self.get_users_with_flag('is_pro')
+
+    def get_admin_ids(self) -> List[int]:
+        """Get admin ids straight from the partial index"""
+        try:
+            rows = self.connections.get().execute('SELECT id FROM users WHERE is_admin = 1').fetchall()
+            return [row[0] for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error getting admin ids: {e}")
+            return []
+
+    def count_stats(self, cursor: sqlite3.Cursor = None) -> Dict[str, int]:
+        """Count users, admins, banned and pro from the users table in one round trip"""
+        cursor = cursor or self.connections.get().cursor()
+        row = cursor.execute('''
+            SELECT
+                (SELECT COUNT(*) FROM users),
+                (SELECT COUNT(*) FROM users WHERE is_admin = 1),
+                (SELECT COUNT(*) FROM users WHERE is_banned = 1),
+                (SELECT COUNT(*) FROM users WHERE is_pro = 1)
+        ''').fetchone()
+
+        return {'total': row[0], 'admins': row[1], 'banned': row[2], 'pro': row[3]}
+
+    def get_flagged_ids(self) -> List[tuple]:
+        """Get (flag_position, id) for every set flag, one partial index scan per flag.
+        flag_position follows FLAG_COLUMNS. Raises on error: an empty result would
+        be taken as a complete index with nobody flagged."""
+        return self.connections.get().execute('''
+            SELECT 0, id FROM users WHERE is_admin = 1
+            UNION ALL
+            SELECT 1, id FROM users WHERE is_banned = 1
+            UNION ALL
+            SELECT 2, id FROM users WHERE is_pro = 1
+        ''').fetchall()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get the maintained user, admin, banned, pro and command counters"""
+        try:
+            row = self.connections.get().execute('''
+                SELECT total_users, total_admins, total_banned, total_pro, total_commands
+                FROM bot_stats WHERE id = 1
+            ''').fetchone()
+
+            if row:
+                return {'total': row[0], 'admins': row[1], 'banned': row[2], 'pro': row[3], 'commands': row[4]}
+
+            stats = self.count_stats()
+            stats['commands'] = 0
+            return stats
+
+        except Exception as e:
+            logger.error(f"Error getting stats: {e}")
+            return {'total': 0, 'admins': 0, 'banned': 0, 'pro': 0, 'commands': 0}
+
+    def get_command_stats(self, limit: int = None) -> List[tuple]:
+        """Get (command, uses, last_used) rows, most used first"""
+        try:
+            query = 'SELECT command, uses, last_used FROM command_stats ORDER BY uses DESC'
+            if limit:
+                return self.connections.get().execute(query + ' LIMIT ?', (limit,)).fetchall()
+            return self.connections.get().execute(query).fetchall()
+
+        except Exception as e:
+            logger.error(f"Error getting command stats: {e}")
+            return []
+
+# Global database instance; the file is opened and migrated on first use, so
+# importing core (e.g. from a CLI with its own --db) never touches ./bot.db
+db = Database(lazy=True)
@@ -5,6 +5,7 @@ Force Join Module - Require users to join channels before using bot
 import logging
 from .utils import load_config
 from .database import db
+from .async_database import async_db
 
 logger = logging.getLogger(__name__)
 
@@ -95,9 +96,11 @@ To use this bot, you must join our official channels first:
     def mark_user_checked(self, user_id):
         """Mark user as having passed force join check"""
         try:
-            # Update user record to show they've passed force join
+            # Upsert: with the write-behind buffer a new user's row may not exist yet,
+            # and a plain UPDATE would silently do nothing
             db.execute(
-                "UPDATE users SET force_join_passed = 1 WHERE user_id = ?",
+                "INSERT INTO users (id, force_join_passed) VALUES (?, 1) "
+                "ON CONFLICT(id) DO UPDATE SET force_join_passed = 1",
                 (user_id,)
             )
             logger.info(f"User {user_id} passed force join check")
@@ -108,7 +111,7 @@ To use this bot, you must join our official channels first:
         """Check if user has already passed force join check"""
         try:
             result = db.execute(
-                "SELECT force_join_passed FROM users WHERE user_id = ?",
+                "SELECT force_join_passed FROM users WHERE id = ?",
                 (user_id,)
             ).fetchone()
             
@@ -117,6 +120,14 @@ To use this bot, you must join our official channels first:
             logger.error(f"Failed to check force join status for user {user_id}: {e}")
             return False
     
+    async def mark_user_checked_async(self, user_id):
+        """Mark user as passed on the database writer thread"""
+        await async_db.write(self.mark_user_checked, user_id)
+    
+    async def has_user_passed_async(self, user_id):
+        """Check force join status on a database reader thread"""
+        return await async_db.read(self.has_user_passed, user_id)
+    
     async def enforce_force_join(self, bot, event):
         """
         Enforce force join requirement
@@ -132,7 +143,7 @@ To use this bot, you must join our official channels first:
         user_id = user.id
         
         # Check if user has already passed (to avoid repeated API calls)
-        if self.has_user_passed(user_id):
+        if await self.has_user_passed_async(user_id):
             return True, None, None
         
         # Check current membership status
@@ -140,7 +151,7 @@ To use this bot, you must join our official channels first:
         
         if is_member:
             # User is now a member, mark as passed
-            self.mark_user_checked(user_id)
+            await self.mark_user_checked_async(user_id)
             return True, None, None
         
         # User needs to join channels
@@ -0,0 +1,316 @@
+"""
+Migrations - Versioned schema changes applied at startup
+Each migration runs in its own transaction and is recorded in schema_version.
+Online migrations (slow index builds) are deferred until the bot is running.
+"""
+
+import sqlite3
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+class Migration:
+    """One ordered schema change"""
+
+    def __init__(self, version: int, description: str, apply: Callable[[sqlite3.Connection], None],
+                 online: bool = False):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.online = online
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """Add a column unless it already exists"""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column in columns:
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+def _create_base_tables(conn: sqlite3.Connection):
+    # Users table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            is_admin INTEGER DEFAULT 0,
+            is_banned INTEGER DEFAULT 0,
+            is_pro INTEGER DEFAULT 0,
+            join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Chat settings table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_settings (
+            chat_id INTEGER PRIMARY KEY,
+            chat_title TEXT,
+            welcome_enabled INTEGER DEFAULT 1,
+            rules_text TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Bot statistics table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bot_stats (
+            id INTEGER PRIMARY KEY,
+            total_users INTEGER DEFAULT 0,
+            total_commands INTEGER DEFAULT 0,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Per-command usage totals
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS command_stats (
+            command TEXT PRIMARY KEY,
+            uses INTEGER DEFAULT 0,
+            last_used TIMESTAMP
+        )
+    ''')
+
+def _create_flag_indexes(conn: sqlite3.Connection):
+    # Partial indexes so role lookups and counts only visit flagged users
+    for column in ('is_admin', 'is_banned', 'is_pro'):
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_users_{column} ON users(id) WHERE {column} = 1')
+
+# Counters in bot_stats row 1 kept up to date by the triggers below
+STATS_COUNTERS = ('total_admins', 'total_banned', 'total_pro')
+
+STATS_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_stats_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE bot_stats SET
+            total_users = total_users + 1,
+            total_admins = total_admins + (NEW.is_admin != 0),
+            total_banned = total_banned + (NEW.is_banned != 0),
+            total_pro = total_pro + (NEW.is_pro != 0),
+            last_updated = CURRENT_TIMESTAMP
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_stats_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE bot_stats SET
+            total_users = total_users - 1,
+            total_admins = total_admins - (OLD.is_admin != 0),
+            total_banned = total_banned - (OLD.is_banned != 0),
+            total_pro = total_pro - (OLD.is_pro != 0),
+            last_updated = CURRENT_TIMESTAMP
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_stats_update AFTER UPDATE OF is_admin, is_banned, is_pro ON users
+    WHEN (NEW.is_admin != 0) != (OLD.is_admin != 0)
+      OR (NEW.is_banned != 0) != (OLD.is_banned != 0)
+      OR (NEW.is_pro != 0) != (OLD.is_pro != 0)
+    BEGIN
+        UPDATE bot_stats SET
+            total_admins = total_admins + (NEW.is_admin != 0) - (OLD.is_admin != 0),
+            total_banned = total_banned + (NEW.is_banned != 0) - (OLD.is_banned != 0),
+            total_pro = total_pro + (NEW.is_pro != 0) - (OLD.is_pro != 0),
+            last_updated = CURRENT_TIMESTAMP
+        WHERE id = 1;
+    END
+    ''',
+)
+
+def _create_stats_counters(conn: sqlite3.Connection):
+    added = False
+    for column in STATS_COUNTERS:
+        added = add_column_if_missing(conn, 'bot_stats', column, 'INTEGER DEFAULT 0') or added
+
+    for trigger in STATS_TRIGGERS:
+        conn.execute(trigger)
+
+    # Backfill from the users table once, when the counters are new
+    if added or not conn.execute('SELECT 1 FROM bot_stats WHERE id = 1').fetchone():
+        conn.execute('''
+            INSERT INTO bot_stats (id, total_users, total_admins, total_banned, total_pro)
+            SELECT 1,
+                (SELECT COUNT(*) FROM users),
+                (SELECT COUNT(*) FROM users WHERE is_admin = 1),
+                (SELECT COUNT(*) FROM users WHERE is_banned = 1),
+                (SELECT COUNT(*) FROM users WHERE is_pro = 1)
+            WHERE 1
+            ON CONFLICT(id) DO UPDATE SET
+                total_users = excluded.total_users,
+                total_admins = excluded.total_admins,
+                total_banned = excluded.total_banned,
+                total_pro = excluded.total_pro,
+                last_updated = CURRENT_TIMESTAMP
+        ''')
+
+def _add_force_join_column(conn: sqlite3.Connection):
+    add_column_if_missing(conn, 'users', 'force_join_passed', 'INTEGER DEFAULT 0')
+
+def _create_last_seen_index(conn: sqlite3.Connection):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_last_seen ON users(last_seen)')
+
+def _create_restrictions(conn: sqlite3.Connection):
+    # Timed bans and mutes; expires_at is a unix timestamp, NULL for permanent mutes
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS restrictions (
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            expires_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, kind)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_restrictions_expires_at ON restrictions(expires_at)')
+
+# Flag and restriction changes logged for other processes sharing the database.
+# flags packs is_admin | is_banned << 1 | is_pro << 2; removed marks a lifted restriction.
+FLAGS_EXPR = '(({row}.is_admin != 0) | (({row}.is_banned != 0) << 1) | (({row}.is_pro != 0) << 2))'
+
+CHANGE_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS users_changes_insert AFTER INSERT ON users
+    WHEN NEW.is_admin != 0 OR NEW.is_banned != 0 OR NEW.is_pro != 0
+    BEGIN
+        INSERT INTO changes (user_id, kind, flags) VALUES (NEW.id, 'flags', {FLAGS_EXPR.format(row='NEW')});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS users_changes_update AFTER UPDATE OF is_admin, is_banned, is_pro ON users
+    WHEN {FLAGS_EXPR.format(row='NEW')} != {FLAGS_EXPR.format(row='OLD')}
+    BEGIN
+        INSERT INTO changes (user_id, kind, flags) VALUES (NEW.id, 'flags', {FLAGS_EXPR.format(row='NEW')});
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_changes_delete AFTER DELETE ON users
+    WHEN OLD.is_admin != 0 OR OLD.is_banned != 0 OR OLD.is_pro != 0
+    BEGIN
+        INSERT INTO changes (user_id, kind, flags) VALUES (OLD.id, 'flags', 0);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS restrictions_changes_insert AFTER INSERT ON restrictions
+    BEGIN
+        INSERT INTO changes (user_id, kind, expires_at) VALUES (NEW.user_id, NEW.kind, NEW.expires_at);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS restrictions_changes_update AFTER UPDATE OF expires_at ON restrictions
+    BEGIN
+        INSERT INTO changes (user_id, kind, expires_at) VALUES (NEW.user_id, NEW.kind, NEW.expires_at);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS restrictions_changes_delete AFTER DELETE ON restrictions
+    BEGIN
+        INSERT INTO changes (user_id, kind, removed) VALUES (OLD.user_id, OLD.kind, 1);
+    END
+    ''',
+)
+
+def _create_change_feed(conn: sqlite3.Connection):
+    # AUTOINCREMENT so sequence numbers are never reused after pruning
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            flags INTEGER,
+            expires_at REAL,
+            removed INTEGER DEFAULT 0
+        )
+    ''')
+
+    for trigger in CHANGE_TRIGGERS:
+        conn.execute(trigger)
+
+# Ordered list of all migrations; append new ones with the next version number
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Base tables", _create_base_tables),
+    Migration(2, "Partial indexes on user flags", _create_flag_indexes),
+    Migration(3, "Maintained counters in bot_stats", _create_stats_counters),
+    Migration(4, "Force join status column", _add_force_join_column),
+    Migration(5, "Index on users.last_seen", _create_last_seen_index, online=True),
+    Migration(6, "Timed ban and mute restrictions", _create_restrictions),
+    Migration(7, "Change feed for cross-process cache invalidation", _create_change_feed),
+]
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    """Create the schema_version table if needed"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def get_applied(conn: sqlite3.Connection) -> set:
+    """Get every applied migration version (online ones may be applied out of order)"""
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+
+def get_version(conn: sqlite3.Connection) -> int:
+    """Get the highest version with every migration up to it applied; a deferred
+    online migration holds the version below it even when later ones are applied"""
+    done = get_applied(conn)
+    version = 0
+    while version + 1 in done:
+        version += 1
+    return version
+
+def get_pending(conn: sqlite3.Connection) -> List[Migration]:
+    """Get the migrations not applied yet, including deferred online ones"""
+    done = get_applied(conn)
+    return [migration for migration in MIGRATIONS if migration.version not in done]
+
+def _apply(conn: sqlite3.Connection, migration: Migration) -> bool:
+    """Apply one migration in its own transaction; False if another process got there first"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if migration.version in get_applied(conn):
+            conn.rollback()
+            return False
+
+        migration.apply(conn)
+        conn.execute(
+            'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+            (migration.version, migration.description)
+        )
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    logger.info(f"Applied migration {migration.version}: {migration.description}")
+    return True
+
+def run_migrations(conn: sqlite3.Connection, online: bool = False, limit: int = None) -> int:
+    """Apply up to limit pending migrations in order.
+
+    Without online=True online migrations are skipped, so startup never waits on a
+    slow index build; call again with online=True once the bot is running. Online
+    migrations only add indexes, so later migrations never depend on them.
+    """
+    done = get_applied(conn)
+    applied = 0
+
+    for migration in MIGRATIONS:
+        if limit is not None and applied >= limit:
+            break
+        if migration.version in done:
+            continue
+        if migration.online and not online:
+            logger.info(f"Deferring online migration {migration.version}: {migration.description}")
+            continue
+        if _apply(conn, migration):
+            applied += 1
+
+    return applied
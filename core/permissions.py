@@ -2,53 +2,286 @@
 Permissions System - Admin, ban, and pro user management
 """
 
+import heapq
 import logging
-from typing import Set
-from .database import db
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Optional, Tuple, Iterable, List
+from .database import db, FLAG_COLUMNS
+from .async_database import async_db
+from .restrictions import restriction_scheduler, BAN, MUTE
 
 logger = logging.getLogger(__name__)
 
-# In-memory admin cache for faster lookups
-admin_cache: Set[int] = set()
+# (is_admin, is_banned, is_pro); also cached for unknown users as a negative entry
+Flags = Tuple[bool, bool, bool]
+NO_FLAGS: Flags = (False, False, False)
+ADMIN, BANNED, PRO = 0, 1, 2
 
-def load_admins():
-    """Load admins from database into cache"""
+class FlagCache:
+    """Bounded LRU of per-user admin/banned/pro flags with a TTL.
+
+    Only consulted while the flag index is not loaded (startup before
+    load_admins, or after it failed); once loaded, flag_index answers every check.
+    """
+
+    def __init__(self, max_size: int = 50000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # Generations: each invalidation gets a new one, so a read that started
+        # before it cannot put the stale flags back. _floor covers forgotten users.
+        self._generation = 0
+        self._invalidated: OrderedDict = OrderedDict()
+        self._floor = 0
+
+    def configure(self, max_size: int = None, ttl_seconds: float = None):
+        """Apply settings from config"""
+        if max_size is not None:
+            self.max_size = max_size
+        if ttl_seconds is not None:
+            self.ttl = ttl_seconds
+
+    def get(self, user_id: int) -> Optional[Flags]:
+        """Get cached flags, or None if missing or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self) -> int:
+        """Current generation; take it before reading flags and pass it to put()"""
+        return self._generation
+
+    def put(self, user_id: int, flags: Flags, ttl: float = None, since: int = None):
+        """Cache flags for a user, unless they were invalidated after generation since"""
+        if since is not None and (self._floor > since or self._invalidated.get(user_id, 0) > since):
+            return
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[user_id] = (flags, expires_at)
+        self._entries.move_to_end(user_id)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Forget a user so the next check reads the database"""
+        self._entries.pop(user_id, None)
+
+        self._generation += 1
+        self._invalidated[user_id] = self._generation
+        self._invalidated.move_to_end(user_id)
+        while len(self._invalidated) > self.max_size:
+            _, generation = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, generation)
+
+    def clear(self):
+        """Forget everything"""
+        self._entries.clear()
+
+        self._generation += 1
+        self._invalidated.clear()
+        self._floor = self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Global flag cache shared by all permission checks
+flag_cache = FlagCache()
+
+class IdSet:
+    """Sorted array('q') of user ids with O(log n) membership, 8 bytes per id"""
+
+    __slots__ = ('ids',)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.ids = array('q', sorted(ids))
+
+    def __contains__(self, user_id: int) -> bool:
+        ids = self.ids
+        index = bisect_left(ids, user_id)
+        return index < len(ids) and ids[index] == user_id
+
+    def add(self, user_id: int):
+        index = bisect_left(self.ids, user_id)
+        if index == len(self.ids) or self.ids[index] != user_id:
+            self.ids.insert(index, user_id)
+
+    def discard(self, user_id: int):
+        index = bisect_left(self.ids, user_id)
+        if index < len(self.ids) and self.ids[index] == user_id:
+            del self.ids[index]
+
+    def update(self, user_ids: Iterable[int]):
+        """Add many ids with one merge instead of one insert each"""
+        new_ids = sorted({user_id for user_id in user_ids if user_id not in self})
+        if new_ids:
+            self.ids = array('q', heapq.merge(self.ids, new_ids))
+
+    def difference_update(self, user_ids: Iterable[int]):
+        """Remove many ids with one pass over the array"""
+        remove = {user_id for user_id in user_ids if user_id in self}
+        if remove:
+            self.ids = array('q', (user_id for user_id in self.ids if user_id not in remove))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def nbytes(self) -> int:
+        return self.ids.itemsize * len(self.ids)
+
+class FlagIndex:
+    """Complete in-memory index of flagged users, loaded once at startup.
+    Once loaded it is authoritative: any id not in a set has that flag cleared."""
+
+    def __init__(self):
+        self.sets = (IdSet(), IdSet(), IdSet())
+        self.loaded = False
+
+    def load(self, flagged: Iterable[tuple]):
+        """Build from (flag_position, id) rows"""
+        ids = ([], [], [])
+        for position, user_id in flagged:
+            ids[position].append(user_id)
+
+        self.sets = tuple(IdSet(flag_ids) for flag_ids in ids)
+        self.loaded = True
+
+    def flags(self, user_id: int) -> Flags:
+        """Get a user's flags"""
+        admins, banned, pro = self.sets
+        return (user_id in admins, user_id in banned, user_id in pro)
+
+    def set(self, position: int, user_id: int, value: bool):
+        """Keep the index in sync after a flag change"""
+        if value:
+            self.sets[position].add(user_id)
+        else:
+            self.sets[position].discard(user_id)
+
+    def set_many(self, position: int, user_ids: List[int], value: bool):
+        """Keep the index in sync after a bulk flag change"""
+        if value:
+            self.sets[position].update(user_ids)
+        else:
+            self.sets[position].difference_update(user_ids)
+
+    def nbytes(self) -> int:
+        return sum(id_set.nbytes() for id_set in self.sets)
+
+# Global flag index; once loaded it answers every check and flag_cache goes unused
+flag_index = FlagIndex()
+
+def _flags_from_user(user) -> Flags:
+    """Build flags from a user record (or None for unknown users)"""
+    if not user:
+        return NO_FLAGS
+    return (user['is_admin'], user['is_banned'], user['is_pro'])
+
+def cached_flags(user_id: int) -> Optional[Flags]:
+    """Get a user's flags from the index or cache only, or None if unknown.
+    The index keeps every check off the disk; the cache is only its fallback."""
+    if flag_index.loaded:
+        return flag_index.flags(user_id)
+    return flag_cache.get(user_id)
+
+def remember_flags(user, user_id: int, since: int = None) -> Flags:
+    """Cache the flags of a freshly loaded user record (None only for a real missing row).
+    since is flag_cache.generation() from before the read."""
+    flags = _flags_from_user(user)
+    flag_cache.put(user_id, flags, since=since)
+    return flags
+
+def get_flags(user_id: int) -> Flags:
+    """Get a user's flags, from the index or cache when possible"""
+    flags = cached_flags(user_id)
+    if flags is None:
+        since = flag_cache.generation()
+        try:
+            user = db.find_user(user_id)
+        except Exception as e:
+            # Not cached, so the next check tries the database again
+            logger.error(f"Error getting flags for {user_id}: {e}")
+            return NO_FLAGS
+        flags = remember_flags(user, user_id, since)
+    return flags
+
+async def get_flags_async(user_id: int) -> Flags:
+    """Get a user's flags without blocking the event loop"""
+    flags = cached_flags(user_id)
+    if flags is None:
+        # A ban or admin change landing during the read must not be overwritten
+        since = flag_cache.generation()
+        try:
+            user = await async_db.find_user(user_id)
+        except Exception as e:
+            logger.error(f"Error getting flags for {user_id}: {e}")
+            return NO_FLAGS
+        flags = remember_flags(user, user_id, since)
+    return flags
+
+def load_admins() -> bool:
+    """Load admins, banned and pro users from database into the flag index.
+    On failure the previous index (or none) stays in place."""
     try:
-        users = db.get_all_users()
-        admin_cache.clear()
+        flag_index.load(db.get_flagged_ids())
+        flag_cache.clear()
         
-        for user in users:
-            if user['is_admin']:
-                admin_cache.add(user['id'])
-        
-        logger.info(f"Loaded {len(admin_cache)} admins into cache")
+        admins, banned, pro = (len(id_set) for id_set in flag_index.sets)
+        logger.info(f"Loaded {admins} admins, {banned} banned and {pro} pro users into index "
+                    f"({flag_index.nbytes()} bytes)")
+        return True
         
     except Exception as e:
-        logger.error(f"Error loading admins: {e}")
+        logger.error(f"Error loading admins, keeping previous index: {e}")
+        return False
 
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
     if not user_id:
         return False
     
-    # Check cache first
-    if user_id in admin_cache:
-        return True
-    
-    # Check database
-    user = db.get_user(user_id)
-    if user and user['is_admin']:
-        admin_cache.add(user_id)
-        return True
+    return get_flags(user_id)[ADMIN]
+
+async def is_admin_async(user_id: int) -> bool:
+    """Check if user is admin without blocking the event loop"""
+    if not user_id:
+        return False
     
-    return False
+    return (await get_flags_async(user_id))[ADMIN]
+
+def _admin_changed(user_id: int, value: bool):
+    """Sync caches after an admin change"""
+    flag_cache.invalidate(user_id)
+    flag_index.set(ADMIN, user_id, value)
+    logger.info(f"User {user_id} {'added as' if value else 'removed from'} admin")
 
 def add_admin(user_id: int) -> bool:
     """Add user as admin"""
     try:
         db.set_admin(user_id, True)
-        admin_cache.add(user_id)
-        logger.info(f"User {user_id} added as admin")
+        _admin_changed(user_id, True)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error adding admin {user_id}: {e}")
+        return False
+
+async def add_admin_async(user_id: int) -> bool:
+    """Add user as admin without blocking the event loop"""
+    try:
+        await async_db.write(db.set_admin, user_id, True)
+        _admin_changed(user_id, True)
         return True
         
     except Exception as e:
@@ -59,8 +292,18 @@ def remove_admin(user_id: int) -> bool:
     """Remove user from admin"""
     try:
         db.set_admin(user_id, False)
-        admin_cache.discard(user_id)
-        logger.info(f"User {user_id} removed from admin")
+        _admin_changed(user_id, False)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error removing admin {user_id}: {e}")
+        return False
+
+async def remove_admin_async(user_id: int) -> bool:
+    """Remove user from admin without blocking the event loop"""
+    try:
+        await async_db.write(db.set_admin, user_id, False)
+        _admin_changed(user_id, False)
         return True
         
     except Exception as e:
@@ -72,14 +315,52 @@ def is_banned(user_id: int) -> bool:
     if not user_id:
         return False
     
-    user = db.get_user(user_id)
-    return user and user['is_banned']
+    return get_flags(user_id)[BANNED]
 
-def ban_user(user_id: int) -> bool:
-    """Ban a user"""
-    try:
-        db.set_ban(user_id, True)
+async def is_banned_async(user_id: int) -> bool:
+    """Check if user is banned without blocking the event loop"""
+    if not user_id:
+        return False
+    
+    return (await get_flags_async(user_id))[BANNED]
+
+def _banned(user_id: int, duration: float, expires_at: float):
+    """Sync caches and the scheduler after a ban"""
+    flag_cache.invalidate(user_id)
+    flag_index.set(BANNED, user_id, True)
+
+    if expires_at is None:
+        restriction_scheduler.untrack(user_id, BAN)
         logger.info(f"User {user_id} banned")
+    else:
+        restriction_scheduler.track(user_id, BAN, expires_at)
+        logger.info(f"User {user_id} banned for {duration:.0f}s")
+
+def _unbanned(user_id: int):
+    """Sync caches and the scheduler after an unban"""
+    flag_cache.invalidate(user_id)
+    flag_index.set(BANNED, user_id, False)
+    restriction_scheduler.untrack(user_id, BAN)
+    logger.info(f"User {user_id} unbanned")
+
+def ban_user(user_id: int, duration: float = None) -> bool:
+    """Ban a user, for duration seconds if given, otherwise permanently"""
+    try:
+        expires_at = time.time() + duration if duration else None
+        db.set_ban(user_id, True, expires_at)
+        _banned(user_id, duration, expires_at)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error banning user {user_id}: {e}")
+        return False
+
+async def ban_user_async(user_id: int, duration: float = None) -> bool:
+    """Ban a user without blocking the event loop"""
+    try:
+        expires_at = time.time() + duration if duration else None
+        await async_db.write(db.set_ban, user_id, True, expires_at)
+        _banned(user_id, duration, expires_at)
         return True
         
     except Exception as e:
@@ -90,39 +371,203 @@ def unban_user(user_id: int) -> bool:
     """Unban a user"""
     try:
         db.set_ban(user_id, False)
-        logger.info(f"User {user_id} unbanned")
+        _unbanned(user_id)
         return True
         
     except Exception as e:
         logger.error(f"Error unbanning user {user_id}: {e}")
         return False
 
+async def unban_user_async(user_id: int) -> bool:
+    """Unban a user without blocking the event loop"""
+    try:
+        await async_db.write(db.set_ban, user_id, False)
+        _unbanned(user_id)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error unbanning user {user_id}: {e}")
+        return False
+
+def _ban_expired(user_id: int):
+    """Drop cached ban state once the scheduler has lifted a timed ban"""
+    flag_cache.invalidate(user_id)
+    flag_index.set(BANNED, user_id, False)
+
+restriction_scheduler.on_lift[BAN] = _ban_expired
+
+def is_muted(user_id: int) -> bool:
+    """Check if user is muted"""
+    if not user_id:
+        return False
+    
+    return restriction_scheduler.is_muted(user_id)
+
+def mute_user(user_id: int, duration: float = None) -> bool:
+    """Mute a user, for duration seconds if given, otherwise until unmuted"""
+    try:
+        expires_at = time.time() + duration if duration else None
+        db.set_restriction(user_id, MUTE, expires_at)
+        restriction_scheduler.track(user_id, MUTE, expires_at)
+        logger.info(f"User {user_id} muted" + (f" for {duration:.0f}s" if duration else ""))
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error muting user {user_id}: {e}")
+        return False
+
+async def mute_user_async(user_id: int, duration: float = None) -> bool:
+    """Mute a user without blocking the event loop"""
+    try:
+        expires_at = time.time() + duration if duration else None
+        await async_db.write(db.set_restriction, user_id, MUTE, expires_at)
+        restriction_scheduler.track(user_id, MUTE, expires_at)
+        logger.info(f"User {user_id} muted" + (f" for {duration:.0f}s" if duration else ""))
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error muting user {user_id}: {e}")
+        return False
+
+def unmute_user(user_id: int) -> bool:
+    """Unmute a user"""
+    try:
+        db.clear_restriction(user_id, MUTE)
+        restriction_scheduler.untrack(user_id, MUTE)
+        logger.info(f"User {user_id} unmuted")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error unmuting user {user_id}: {e}")
+        return False
+
+async def unmute_user_async(user_id: int) -> bool:
+    """Unmute a user without blocking the event loop"""
+    try:
+        await async_db.write(db.clear_restriction, user_id, MUTE)
+        restriction_scheduler.untrack(user_id, MUTE)
+        logger.info(f"User {user_id} unmuted")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error unmuting user {user_id}: {e}")
+        return False
+
 def is_pro(user_id: int) -> bool:
     """Check if user is pro"""
     if not user_id:
         return False
     
-    user = db.get_user(user_id)
-    return user and user['is_pro']
+    return get_flags(user_id)[PRO]
+
+async def is_pro_async(user_id: int) -> bool:
+    """Check if user is pro without blocking the event loop"""
+    if not user_id:
+        return False
+    
+    return (await get_flags_async(user_id))[PRO]
+
+def _pro_changed(user_id: int, value: bool):
+    """Sync caches after a pro change"""
+    flag_cache.invalidate(user_id)
+    flag_index.set(PRO, user_id, value)
+    logger.info(f"User {user_id} {'added to' if value else 'removed from'} pro")
 
 def set_pro(user_id: int, is_pro_user: bool = True) -> bool:
     """Set user pro status"""
     try:
         db.set_pro(user_id, is_pro_user)
-        status = "added to" if is_pro_user else "removed from"
-        logger.info(f"User {user_id} {status} pro")
+        _pro_changed(user_id, is_pro_user)
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error setting pro status for {user_id}: {e}")
+        return False
+
+async def set_pro_async(user_id: int, is_pro_user: bool = True) -> bool:
+    """Set user pro status without blocking the event loop"""
+    try:
+        await async_db.write(db.set_pro, user_id, is_pro_user)
+        _pro_changed(user_id, is_pro_user)
         return True
         
     except Exception as e:
         logger.error(f"Error setting pro status for {user_id}: {e}")
         return False
 
+# Rows per bulk transaction; each chunk is a separate writer job so other
+# writes (and readers waiting on the lock) get in between chunks
+BULK_CHUNK_SIZE = 1000
+
+async def _set_flag_many(position: int, user_ids: List[int], value: bool, expires_at: float = None) -> int:
+    """Set a flag for many users in chunked transactions, updating caches in bulk per chunk.
+    Returns how many leading user_ids were written before any error."""
+    column = FLAG_COLUMNS[position]
+    done = 0
+
+    for start in range(0, len(user_ids), BULK_CHUNK_SIZE):
+        chunk = user_ids[start:start + BULK_CHUNK_SIZE]
+        try:
+            await async_db.write(db.set_flag_many, column, chunk, value, expires_at)
+        except Exception as e:
+            logger.error(f"Error setting {column} for {len(chunk)} users: {e}")
+            break
+
+        for user_id in chunk:
+            flag_cache.invalidate(user_id)
+        flag_index.set_many(position, chunk, value)
+        done += len(chunk)
+
+    return done
+
+async def ban_users(user_ids: Iterable[int], duration: float = None) -> int:
+    """Ban many users, for duration seconds if given; returns how many were banned"""
+    expires_at = time.time() + duration if duration else None
+    user_ids = list(dict.fromkeys(user_ids))
+    banned = await _set_flag_many(BANNED, user_ids, True, expires_at)
+
+    for user_id in user_ids[:banned]:
+        if expires_at is None:
+            restriction_scheduler.untrack(user_id, BAN)
+        else:
+            restriction_scheduler.track(user_id, BAN, expires_at)
+
+    logger.info(f"Banned {banned} users" + (f" for {duration:.0f}s" if duration else ""))
+    return banned
+
+async def unban_users(user_ids: Iterable[int]) -> int:
+    """Unban many users; returns how many were unbanned"""
+    user_ids = list(dict.fromkeys(user_ids))
+    unbanned = await _set_flag_many(BANNED, user_ids, False)
+
+    for user_id in user_ids[:unbanned]:
+        restriction_scheduler.untrack(user_id, BAN)
+
+    logger.info(f"Unbanned {unbanned} users")
+    return unbanned
+
+async def add_admins(user_ids: Iterable[int]) -> int:
+    """Add many admins; returns how many were added"""
+    added = await _set_flag_many(ADMIN, list(dict.fromkeys(user_ids)), True)
+    logger.info(f"Added {added} admins")
+    return added
+
+async def remove_admins(user_ids: Iterable[int]) -> int:
+    """Remove many admins; returns how many were removed"""
+    removed = await _set_flag_many(ADMIN, list(dict.fromkeys(user_ids)), False)
+    logger.info(f"Removed {removed} admins")
+    return removed
+
+async def set_pro_users(user_ids: Iterable[int], is_pro_user: bool = True) -> int:
+    """Set pro status for many users; returns how many were updated"""
+    updated = await _set_flag_many(PRO, list(dict.fromkeys(user_ids)), is_pro_user)
+    logger.info(f"Set pro={is_pro_user} for {updated} users")
+    return updated
+
 def get_admin_list() -> list:
     """Get list of all admins"""
     try:
-        users = db.get_all_users()
-        admins = [user for user in users if user['is_admin']]
-        return admins
+        return db.get_admins()
         
     except Exception as e:
         logger.error(f"Error getting admin list: {e}")
@@ -131,9 +576,7 @@ def get_admin_list() -> list:
 def get_banned_list() -> list:
     """Get list of all banned users"""
     try:
-        users = db.get_all_users()
-        banned = [user for user in users if user['is_banned']]
-        return banned
+        return db.get_banned_users()
         
     except Exception as e:
         logger.error(f"Error getting banned list: {e}")
@@ -145,7 +588,7 @@ def admin_required(func):
     async def wrapper(message, *args, **kwargs):
         user_id = message.from_user.id if message.from_user else None
         
-        if not is_admin(user_id):
+        if not await is_admin_async(user_id):
             await message.reply("❌ This command requires admin permissions.")
             return
         
@@ -159,7 +602,7 @@ def not_banned(func):
     async def wrapper(message, *args, **kwargs):
         user_id = message.from_user.id if message.from_user else None
         
-        if is_banned(user_id):
+        if await is_banned_async(user_id):
             await message.reply("❌ You are banned from using this bot.")
             return
         
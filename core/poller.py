@@ -0,0 +1,139 @@
+"""
+Update Poller - Long polling with tunable batch size, timeout, backoff and startup policy
+Asks getUpdates only for the update types that have handlers, hands each batch to a
+sink (normally the dispatcher, which queues into the update scheduler) and retries
+failed fetches with jittered exponential backoff.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff, BackoffConfig
+
+logger = logging.getLogger(__name__)
+
+# What to do with updates that piled up while the bot was down
+PENDING_POLICIES = ('process', 'skip', 'drain')
+
+class UpdatePoller:
+    """getUpdates loop feeding a sink; one instance per bot token"""
+
+    def __init__(self, limit: int = 100, timeout: int = 30, pending_updates: str = 'process',
+                 drain_max_age: int = 300):
+        self.limit = limit
+        self.timeout = timeout
+        self.pending_updates = pending_updates
+        self.drain_max_age = drain_max_age
+        self.backoff_config = BackoffConfig(min_delay=1.0, max_delay=5.0, factor=1.3, jitter=0.1)
+
+        self.offset: Optional[int] = None
+        self.running = False
+
+        # Metrics
+        self.polls = 0
+        self.empty_polls = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def configure(self, limit: int = None, timeout: int = None, pending_updates: str = None,
+                  drain_max_age: int = None, backoff: Dict[str, float] = None):
+        """Apply settings from config"""
+        if limit is not None:
+            self.limit = max(1, min(100, limit))
+        if timeout is not None:
+            self.timeout = timeout
+        if pending_updates is not None:
+            if pending_updates not in PENDING_POLICIES:
+                raise ValueError(f"pending_updates must be one of {PENDING_POLICIES}, got '{pending_updates}'")
+            self.pending_updates = pending_updates
+        if drain_max_age is not None:
+            self.drain_max_age = drain_max_age
+        if backoff:
+            self.backoff_config = BackoffConfig(**{
+                'min_delay': self.backoff_config.min_delay,
+                'max_delay': self.backoff_config.max_delay,
+                'factor': self.backoff_config.factor,
+                'jitter': self.backoff_config.jitter,
+                **backoff
+            })
+
+    async def run(self, bot: Bot, sink: Callable[[Update], Awaitable[Any]], allowed_updates: List[str] = None):
+        """Poll until cancelled, passing every update to sink in order"""
+        if self.pending_updates == 'skip':
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Dropped pending updates")
+        else:
+            await bot.delete_webhook()
+
+        # While draining, stale updates from before startup are acknowledged but not handled
+        draining = self.pending_updates == 'drain'
+        cutoff = time.time() - self.drain_max_age
+
+        backoff = Backoff(config=self.backoff_config)
+        request_timeout = int(bot.session.timeout + self.timeout) if bot.session.timeout else None
+        self.running = True
+        logger.info(f"Polling {allowed_updates or 'all updates'} (limit {self.limit}, timeout {self.timeout}s, "
+                    f"pending updates: {self.pending_updates})")
+
+        try:
+            while True:
+                method = GetUpdates(offset=self.offset, limit=self.limit, allowed_updates=allowed_updates,
+                                    timeout=0 if draining else self.timeout)
+                try:
+                    updates = await bot(method, request_timeout=request_timeout)
+                except Exception as e:
+                    self.errors += 1
+                    delay = max(0.0, next(backoff))
+                    logger.error(f"Failed to fetch updates ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                if backoff.counter:
+                    logger.info(f"Polling recovered after {backoff.counter} failed attempts")
+                    backoff.reset()
+
+                self.polls += 1
+                if not updates:
+                    self.empty_polls += 1
+                    if draining:
+                        draining = False
+                        logger.info(f"Backlog drained, {self.dropped} stale updates dropped")
+                    continue
+
+                self.received += len(updates)
+                for update in updates:
+                    self.offset = update.update_id + 1
+                    if draining and is_stale(update, cutoff):
+                        self.dropped += 1
+                        continue
+                    try:
+                        await sink(update)
+                    except Exception as e:
+                        logger.error(f"Error handling update {update.update_id}: {e}")
+        finally:
+            self.running = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Get poller metrics"""
+        return {
+            'polls': self.polls,
+            'empty_polls': self.empty_polls,
+            'received': self.received,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'offset': self.offset
+        }
+
+def is_stale(update: Update, cutoff: float) -> bool:
+    """Check if an update's event was sent before cutoff (updates without a date never are)"""
+    date = getattr(update.event, 'date', None)
+    return date is not None and date.timestamp() < cutoff
+
+# Global update poller
+update_poller = UpdatePoller()
@@ -0,0 +1,179 @@
+"""
+Process Pool - One update fetcher sharding updates to N worker processes
+The fetcher (polling or webhook) sends each update's JSON to worker
+hash(chat) % N over a multiprocessing queue. A chat always lands on the same
+worker, whose update scheduler keeps it in order, while CPU-heavy handlers
+spread across cores. Workers share bot.db; the change feed keeps their
+permission caches in sync.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from .update_scheduler import update_chat_key
+from .poller import update_poller
+from .webhook import serve_webhook
+from .utils import run_until_signal
+
+logger = logging.getLogger(__name__)
+
+# Updates moved from the IPC queue per executor hop on the worker side
+RECEIVE_BATCH = 100
+
+# How often an idle worker checks that the fetcher is still alive, in seconds
+RECEIVE_TIMEOUT = 1.0
+
+class WorkerPool:
+    """Starts worker processes and shards updates to them by chat"""
+
+    def __init__(self, processes: int = 0, queue_size: int = 10000):
+        self.processes = processes
+        self.queue_size = queue_size
+
+        # spawn, not fork: the fetcher already has an event loop and database threads
+        self.context = multiprocessing.get_context('spawn')
+        self.queues: List[Any] = []
+        self.workers: List[Any] = []
+        self.ready = None
+
+        # Metrics
+        self.sent: List[int] = []
+        self.blocked = 0
+
+    def configure(self, processes: int = None, queue_size: int = None):
+        """Apply settings from config"""
+        if processes is not None:
+            self.processes = processes
+        if queue_size is not None:
+            self.queue_size = queue_size
+
+    def start(self, target: Callable, *args):
+        """Spawn the workers; target(index, queue, ready, *args) runs in each one"""
+        self.ready = self.context.Queue()
+        for index in range(self.processes):
+            queue = self.context.Queue(maxsize=self.queue_size)
+            worker = self.context.Process(target=target, args=(index, queue, self.ready) + args,
+                                          name=f"bot-worker-{index}")
+            worker.start()
+            self.queues.append(queue)
+            self.workers.append(worker)
+            self.sent.append(0)
+        logger.info(f"Started {self.processes} worker processes")
+
+    async def wait_ready(self, timeout: float = 120.0) -> List[str]:
+        """Wait until every worker has loaded its handlers; returns the union of their update types"""
+        loop = asyncio.get_running_loop()
+        used: Set[str] = set()
+        for _ in range(self.processes):
+            index, update_types = await loop.run_in_executor(None, self.ready.get, True, timeout)
+            used.update(update_types)
+            logger.info(f"Worker {index} ready")
+        return sorted(used)
+
+    def shard(self, update: Update) -> int:
+        """Worker index for an update; the same chat always maps to the same worker"""
+        return hash(update_chat_key(update)) % self.processes
+
+    async def submit(self, update: Update):
+        """Send an update to its chat's worker; waits if that worker's queue is full"""
+        index = self.shard(update)
+        payload = update.model_dump_json(exclude_none=True)
+        try:
+            self.queues[index].put_nowait(payload)
+        except queue_module.Full:
+            self.blocked += 1
+            await asyncio.get_running_loop().run_in_executor(None, self.queues[index].put, payload)
+        self.sent[index] += 1
+
+    async def stop(self, timeout: float = 10.0):
+        """Ask every worker to finish its queue and exit; kill the ones that don't.
+        Workers ignore SIGINT/SIGTERM so they can drain, hence kill() rather than terminate()."""
+        loop = asyncio.get_running_loop()
+        for queue, worker in zip(self.queues, self.workers):
+            if not worker.is_alive():
+                logger.warning(f"Worker {worker.name} already exited with code {worker.exitcode}")
+                continue
+            try:
+                await loop.run_in_executor(None, partial(queue.put, None, True, timeout))
+            except queue_module.Full:
+                logger.warning(f"Worker {worker.name} queue still full after {timeout}s, killing")
+                worker.kill()
+
+        for queue, worker in zip(self.queues, self.workers):
+            await loop.run_in_executor(None, worker.join, timeout)
+            if worker.is_alive():
+                logger.warning(f"Worker {worker.name} did not stop in {timeout}s, killing")
+                worker.kill()
+                await loop.run_in_executor(None, worker.join, timeout)
+
+            # Nobody reads this queue any more; don't let unsent items block our exit
+            queue.cancel_join_thread()
+
+        self.queues = []
+        self.workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool metrics"""
+        return {
+            'processes': self.processes,
+            'alive': sum(worker.is_alive() for worker in self.workers),
+            'sent': list(self.sent),
+            'blocked': self.blocked
+        }
+
+async def consume(queue, bot: Bot, sink: Callable[[Update], Awaitable[Any]]):
+    """Worker side: feed updates from the IPC queue to sink until the fetcher sends None
+    or exits without sending it"""
+    loop = asyncio.get_running_loop()
+    fetcher = multiprocessing.parent_process()
+    while True:
+        try:
+            payloads = [await loop.run_in_executor(None, queue.get, True, RECEIVE_TIMEOUT)]
+        except queue_module.Empty:
+            if fetcher is not None and not fetcher.is_alive():
+                logger.warning("Fetcher process is gone, stopping worker")
+                return
+            continue
+
+        while len(payloads) < RECEIVE_BATCH:
+            try:
+                payloads.append(queue.get_nowait())
+            except queue_module.Empty:
+                break
+
+        for payload in payloads:
+            if payload is None:
+                return
+            try:
+                await sink(Update.model_validate_json(payload, context={'bot': bot}))
+            except Exception as e:
+                logger.error(f"Error feeding update from fetcher: {e}")
+
+async def run_fetcher(token: str, target: Callable, *args, mode: str = 'polling', webhook: Dict[str, Any] = None):
+    """Fetcher side: start the workers, then poll or serve the webhook into them until
+    cancelled or SIGINT/SIGTERM, and finally let the workers drain and exit"""
+    bot = Bot(token)
+
+    async def fetch():
+        allowed_updates = await worker_pool.wait_ready()
+        if mode == 'webhook':
+            await serve_webhook(bot, worker_pool.submit, allowed_updates=allowed_updates, **(webhook or {}))
+        else:
+            await update_poller.run(bot, worker_pool.submit, allowed_updates=allowed_updates)
+
+    worker_pool.start(target, *args)
+    try:
+        await run_until_signal(fetch())
+    finally:
+        await worker_pool.stop()
+        await bot.session.close()
+
+# Global worker pool
+worker_pool = WorkerPool()
@@ -0,0 +1,148 @@
+"""
+Restrictions - Timed bans and mutes lifted by an in-process min-heap scheduler
+Each timed restriction sits in a heap keyed by its expiry; the scheduler sleeps
+until the earliest one is due, so nothing polls or scans the users table.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Tuple, Optional, Callable
+
+from .async_database import async_db, AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+BAN, MUTE = 'ban', 'mute'
+
+class RestrictionScheduler:
+    """Tracks active restrictions and lifts each one at its exact expiry time"""
+
+    def __init__(self, database: AsyncDatabase):
+        self.database = database
+
+        # (expires_at, user_id, kind); entries whose expiry no longer matches
+        # self.expiries are stale and skipped when they reach the top
+        self.heap: List[Tuple[float, int, str]] = []
+        self.expiries: Dict[Tuple[int, str], float] = {}
+        self.muted: Dict[int, Optional[float]] = {}
+
+        # Called on the event loop after a restriction of that kind is lifted
+        self.on_lift: Dict[str, Callable[[int], None]] = {}
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.lifted = 0
+
+    def load(self) -> int:
+        """Reload pending restrictions from the database, soonest expiry first"""
+        self.heap = []
+        self.expiries = {}
+        self.muted = {}
+
+        rows = self.database.db.get_restrictions()
+        for user_id, kind, expires_at in rows:
+            self.track(user_id, kind, expires_at)
+
+        logger.info(f"Loaded {len(rows)} restrictions ({len(self.expiries)} timed)")
+        return len(rows)
+
+    def track(self, user_id: int, kind: str, expires_at: float = None):
+        """Start tracking a restriction; a newer expiry replaces the old one"""
+        key = (user_id, kind)
+        if kind == MUTE:
+            self.muted[user_id] = expires_at
+
+        if expires_at is None:
+            self.expiries.pop(key, None)
+            return
+
+        self.expiries[key] = expires_at
+        heapq.heappush(self.heap, (expires_at, user_id, kind))
+
+        # Re-arm the sleep if this is now the earliest expiry
+        if self._wakeup and self.heap[0][0] == expires_at:
+            self._wakeup.set()
+
+    def untrack(self, user_id: int, kind: str):
+        """Stop tracking a restriction that was removed by hand"""
+        self.expiries.pop((user_id, kind), None)
+        if kind == MUTE:
+            self.muted.pop(user_id, None)
+
+    def is_muted(self, user_id: int) -> bool:
+        """Check if a user is muted"""
+        if user_id not in self.muted:
+            return False
+        expires_at = self.muted[user_id]
+        return expires_at is None or expires_at > time.time()
+
+    def _next_delay(self) -> Optional[float]:
+        """Seconds until the earliest live expiry, or None if there is none"""
+        while self.heap:
+            expires_at, user_id, kind = self.heap[0]
+            if self.expiries.get((user_id, kind)) == expires_at:
+                return max(0.0, expires_at - time.time())
+            heapq.heappop(self.heap)
+        return None
+
+    async def _lift_due(self):
+        """Lift every restriction whose expiry has passed"""
+        while self.heap and self.heap[0][0] <= time.time():
+            expires_at, user_id, kind = heapq.heappop(self.heap)
+            if self.expiries.get((user_id, kind)) != expires_at:
+                continue
+
+            self.untrack(user_id, kind)
+            try:
+                lifted = await self.database.write(self.database.db.lift_restriction, user_id, kind, expires_at)
+            except Exception as e:
+                logger.error(f"Error lifting {kind} for {user_id}: {e}")
+                continue
+
+            if lifted:
+                self.lifted += 1
+                if kind in self.on_lift:
+                    self.on_lift[kind](user_id)
+                logger.info(f"Lifted expired {kind} for user {user_id}")
+
+    async def _run(self):
+        """Sleep until the next expiry (or a new earlier one), then lift what is due"""
+        while True:
+            self._wakeup.clear()
+            await self._lift_due()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the scheduler loop"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Restriction scheduler started ({len(self.expiries)} pending)")
+
+    async def stop(self):
+        """Stop the scheduler loop; pending expiries are reloaded on next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+    def stats(self) -> Dict[str, int]:
+        """Get scheduler metrics"""
+        return {
+            'pending': len(self.expiries),
+            'muted': len(self.muted),
+            'lifted': self.lifted
+        }
+
+# Global restriction scheduler
+restriction_scheduler = RestrictionScheduler(async_db)
@@ -5,18 +5,193 @@ Converts complex aiogram code to super simple, readable syntax
 
 import logging
 import asyncio
-from typing import Dict, Callable, Any, Optional
+import time
+from typing import Dict, Callable, Any, Optional, List, Union, Tuple, Awaitable
 from aiogram import Bot, Dispatcher, Router
-from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.filters import ChatMemberUpdatedFilter, JOIN_TRANSITION, LEAVE_TRANSITION
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-from .database import db
-from .permissions import is_admin, is_banned, add_admin
+from .async_database import async_db
+from .write_buffer import write_buffer
+from .database import UserRecord
+from .restrictions import restriction_scheduler
+from .change_feed import change_feed
+from .callback_router import CallbackRouter
+from .update_scheduler import update_scheduler
+from .webhook import serve_webhook
+from .poller import update_poller
+from .process_pool import consume
+from .force_join import force_join
+from .utils import rate_limiter, run_until_signal
+from .permissions import get_flags_async, cached_flags, remember_flags, flag_cache, NO_FLAGS, ADMIN, BANNED, PRO
 
 logger = logging.getLogger(__name__)
 
+# Permission names accepted in help() metadata, mapped to flag positions
+PERMISSION_FLAGS = {'admin': ADMIN, 'pro': PRO}
+
+DENIED_MESSAGES = {
+    ADMIN: "❌ This command is for admins only.",
+    PRO: "❌ This command is for pro users only."
+}
+
+# Member event names accepted by SimpleBot.event
+MEMBER_EVENTS = {
+    'member_join': JOIN_TRANSITION,
+    'member_leave': LEAVE_TRANSITION
+}
+
+class StageStats:
+    """Call count and exclusive time of one pipeline stage"""
+
+    __slots__ = ('calls', 'total', 'max')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+class Pipeline:
+    """Ordered middleware chain run around every command, callback and member event.
+
+    A middleware is ``async def stage(ctx, call_next)``; it short-circuits the
+    update by returning without awaiting call_next(). Each stage records its
+    exclusive time (its own work, not the stages after it), and the final
+    handler is recorded as "handler".
+    """
+
+    def __init__(self):
+        self.stages: List[Tuple[str, Callable]] = []
+        self.timings: Dict[str, StageStats] = {'handler': StageStats()}
+
+    def use(self, name: str, middleware: Callable[['Context', Callable[[], Awaitable]], Awaitable]):
+        """Append a middleware stage"""
+        self.stages.append((name, middleware))
+        self.timings.setdefault(name, StageStats())
+
+    async def run(self, ctx: 'Context', handler: Callable[['Context'], Awaitable]) -> Any:
+        """Run ctx through every stage and then the handler"""
+        return await self._call(0, ctx, handler)
+
+    async def _call(self, index: int, ctx: 'Context', handler: Callable) -> Any:
+        if index == len(self.stages):
+            start = time.perf_counter()
+            try:
+                return await handler(ctx)
+            finally:
+                self.timings['handler'].record(time.perf_counter() - start)
+
+        name, middleware = self.stages[index]
+        inner = 0.0
+
+        async def call_next():
+            nonlocal inner
+            start = time.perf_counter()
+            try:
+                return await self._call(index + 1, ctx, handler)
+            finally:
+                inner += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            return await middleware(ctx, call_next)
+        finally:
+            self.timings[name].record(time.perf_counter() - start - inner)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage calls and average/max exclusive time in ms, in pipeline order"""
+        result = {}
+        for name in [name for name, _ in self.stages] + ['handler']:
+            stage = self.timings[name]
+            result[name] = {
+                'calls': stage.calls,
+                'avg_ms': round(stage.total / stage.calls * 1000, 3) if stage.calls else 0.0,
+                'max_ms': round(stage.max * 1000, 3)
+            }
+        return result
+
+async def error_stage(ctx: 'Context', call_next):
+    """Log handler errors and tell the user something went wrong"""
+    try:
+        return await call_next()
+    except Exception as e:
+        logger.error(f"Error in {ctx.kind} {ctx.command or ''}: {e}")
+        if ctx.kind == 'callback':
+            await ctx.callback.answer("❌ Error occurred")
+        elif ctx.kind == 'command':
+            await ctx.message.reply("❌ An error occurred.")
+
+async def tracking_stage(ctx: 'Context', call_next):
+    """Record the user's profile and last_seen through the write buffer"""
+    user = ctx.user
+    if user and ctx.kind != 'member':
+        write_buffer.add_user(user.id, user.username, user.first_name, user.last_name)
+    return await call_next()
+
+async def ban_stage(ctx: 'Context', call_next):
+    """Stop banned users, and ignore muted users silently"""
+    if ctx.kind == 'member' or not ctx.user:
+        return await call_next()
+
+    if await ctx.is_banned():
+        if ctx.kind == 'callback':
+            await ctx.callback.answer("❌ You are banned from using this bot.")
+        else:
+            await ctx.message.reply("❌ You are banned from using this bot.")
+        return
+
+    if restriction_scheduler.is_muted(ctx.user.id):
+        if ctx.kind == 'callback':
+            await ctx.callback.answer()
+        return
+
+    return await call_next()
+
+async def force_join_stage(ctx: 'Context', call_next):
+    """Require the configured channels before commands run"""
+    if not force_join.enabled or ctx.kind != 'command' or await ctx.is_admin():
+        return await call_next()
+
+    allowed, text, buttons = await force_join.enforce_force_join(ctx.bot, ctx)
+    if not allowed:
+        await ctx.message.reply(text, reply_markup=keyboard(buttons))
+        return
+
+    return await call_next()
+
+async def rate_limit_stage(ctx: 'Context', call_next):
+    """Allow at most max_requests commands per user per window when enabled (off by default);
+    admins and callbacks are exempt"""
+    if not rate_limiter.enabled or ctx.kind != 'command' or not ctx.user or await ctx.is_admin():
+        return await call_next()
+
+    count = rate_limiter.hit(ctx.user.id)
+    if count > rate_limiter.max_requests:
+        # Say so once per window, then drop quietly
+        if count == rate_limiter.max_requests + 1:
+            await ctx.message.reply(f"⏳ Slow down! Try again in {rate_limiter.window_seconds}s.")
+        return
+
+    return await call_next()
+
+def default_pipeline() -> Pipeline:
+    """The standard stage order: errors wrap everything, cheap checks run first"""
+    pipeline = Pipeline()
+    pipeline.use('errors', error_stage)
+    pipeline.use('tracking', tracking_stage)
+    pipeline.use('ban', ban_stage)
+    pipeline.use('force_join', force_join_stage)
+    pipeline.use('rate_limit', rate_limit_stage)
+    return pipeline
+
 class SimpleBot:
     """Simple bot wrapper that makes aiogram super easy to use"""
     
@@ -27,73 +202,194 @@ class SimpleBot:
         self.router = Router()
         self.dp.include_router(self.router)
         
+        # Per-chat ordering and the worker cap; passes through until started
+        self.dp.update.outer_middleware(update_scheduler)
+        
         self.commands = {}
         self.events = {}
         
+        # Middleware shared by commands, callbacks and member events
+        self.pipeline = default_pipeline()
+        
+        # One message handler; commands and aliases resolve through this dict
+        self.command_table: Dict[str, Callable] = {}
+        self.aliases: Dict[str, str] = {}
+        self.duplicates: List[str] = []
+        
+        # Per-command counts of runs turned away by max_concurrency or cut off by timeout
+        self.busy: Dict[str, int] = {}
+        self.timeouts: Dict[str, int] = {}
+        self.username: Optional[str] = None
+        self.router.message.register(self._handle_command, self._match_command)
+        
+        # One callback handler; routing happens in the dict/trie, not in aiogram filters
+        self.callbacks = CallbackRouter()
+        self.router.callback_query.register(self._handle_callback, self.callbacks.filter)
+        
         logger.info("SimpleBot initialized")
     
-    def command(self, name: str, description: str = "", admin_only: bool = False):
-        """Decorator to register commands easily"""
+    def command(self, name: str, description: str = "", admin_only: bool = False, requires: tuple = (),
+                aliases: List[str] = (), timeout: float = None, max_concurrency: int = None):
+        """Decorator to register commands easily; timeout (seconds) cancels a slow run and
+        max_concurrency caps how many runs may be in flight at once"""
+        if admin_only and ADMIN not in requires:
+            requires = (ADMIN,) + tuple(requires)
+        denied = DENIED_MESSAGES[requires[0]] if requires else None
+        limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
         def decorator(func):
+            if name in self.commands:
+                self._report_duplicate(f"Duplicate command '/{name}' from {func.__module__}.{func.__qualname__} "
+                                       f"ignored, keeping {self.commands[name]['function'].__module__}."
+                                       f"{self.commands[name]['function'].__qualname__}")
+                return func
+            
             # Store command info
             self.commands[name] = {
                 'function': func,
                 'description': description,
-                'admin_only': admin_only
+                'admin_only': ADMIN in requires,
+                'requires': requires,
+                'timeout': timeout,
+                'max_concurrency': max_concurrency
             }
             
-            # Create aiogram handler
-            async def handler(message: Message):
-                # Add user to database
-                user = message.from_user
-                if user:
-                    db.add_user(user.id, user.username, user.first_name, user.last_name)
+            async def run(ctx: Context):
+                # Check required flags, reusing the flags loaded for the ban check
+                if requires:
+                    flags = await ctx.flags()
+                    if not all(flags[position] for position in requires):
+                        await ctx.message.reply(denied)
+                        return
                 
-                # Check if banned
-                if user and is_banned(user.id):
-                    await message.reply("❌ You are banned from using this bot.")
+                # Turn extra callers away at once instead of queueing them
+                if limit is not None and limit.locked():
+                    self.busy[name] = self.busy.get(name, 0) + 1
+                    await ctx.message.reply(f"⏳ /{name} is busy right now, please try again in a moment.")
                     return
                 
-                # Check admin requirement
-                if admin_only and not is_admin(user.id):
-                    await message.reply("❌ This command is for admins only.")
+                write_buffer.count_command(name)
+                if limit is None:
+                    await self._invoke(name, func, ctx, timeout)
                     return
-                
-                # Execute command
-                try:
-                    await func(self, message)
-                except Exception as e:
-                    logger.error(f"Error in command {name}: {e}")
-                    await message.reply("❌ An error occurred.")
+                async with limit:
+                    await self._invoke(name, func, ctx, timeout)
+            
+            async def handler(message: Message):
+                ctx = Context(message, self, kind='command')
+                ctx.command = name
+                await self.pipeline.run(ctx, run)
+            
+            # A real command name always wins over an alias of another command
+            if name in self.aliases:
+                logger.info(f"Command '/{name}' replaces alias of '/{self.aliases.pop(name)}'")
+            self.command_table[name] = handler
+            
+            for alias in aliases:
+                if alias == name:
+                    continue
+                if alias in self.command_table:
+                    owner = self.aliases.get(alias, alias)
+                    self._report_duplicate(f"Alias '/{alias}' of '/{name}' ignored, already used by '/{owner}'")
+                    continue
+                self.aliases[alias] = name
+                self.command_table[alias] = handler
             
-            # Register with aiogram
-            self.router.message.register(handler, Command(commands=[name]))
             logger.info(f"Command '{name}' registered")
             
             return func
         return decorator
     
+    async def _invoke(self, name: str, func: Callable, ctx: 'Context', timeout: Optional[float]):
+        """Run a command, cancelling it once timeout seconds have passed"""
+        if timeout is None:
+            await func(self, ctx)
+            return
+        
+        scope = asyncio.timeout(timeout)
+        try:
+            async with scope:
+                await func(self, ctx)
+        except TimeoutError:
+            # Only our deadline counts; a TimeoutError raised by the command itself is an error
+            if not scope.expired():
+                raise
+            self.timeouts[name] = self.timeouts.get(name, 0) + 1
+            logger.warning(f"Command '/{name}' timed out after {timeout}s")
+            await ctx.message.reply(f"⌛ /{name} took too long and was cancelled.")
+    
+    def _report_duplicate(self, problem: str):
+        """Record and log a conflicting command or alias"""
+        self.duplicates.append(problem)
+        logger.warning(problem)
+    
+    def _match_command(self, message: Message) -> Any:
+        """aiogram filter: parse the command token once and look it up"""
+        text = message.text or message.caption
+        if not text or text[0] != '/':
+            return False
+        
+        token = text.split(maxsplit=1)[0][1:]
+        name, _, mention = token.partition('@')
+        
+        # "/cmd@OtherBot" is meant for another bot in the group
+        if mention and self.username and mention.lower() != self.username:
+            return False
+        
+        handler = self.command_table.get(name)
+        if handler is None:
+            return False
+        return {'command_handler': handler}
+    
+    async def _handle_command(self, message: Message, command_handler: Callable):
+        """Single entry point for every command message"""
+        await command_handler(message)
+    
     def callback(self, data: str):
-        """Decorator to register callback handlers"""
+        """Decorator to register callback handlers.
+
+        data is either exact callback data ("close_menu") or a pattern with
+        {name} / {name:int} segments ("ttt_{game}_{r:int}_{c:int}"); parsed
+        values are available as ctx.params. A handler may return a string to
+        show as the callback answer.
+        """
         def decorator(func):
-            async def handler(callback: CallbackQuery):
-                try:
-                    await func(self, callback)
-                    await callback.answer()
-                except Exception as e:
-                    logger.error(f"Error in callback {data}: {e}")
-                    await callback.answer("❌ Error occurred")
-            
-            self.router.callback_query.register(handler, lambda c: c.data == data)
+            self.callbacks.add(data, func)
             logger.info(f"Callback '{data}' registered")
-            
             return func
         return decorator
     
+    async def _handle_callback(self, callback: CallbackQuery, callback_route: tuple):
+        """Single entry point for every routed callback query"""
+        pattern, func, params = callback_route
+        ctx = Context(callback, self)
+        ctx.command = pattern
+        ctx.params = params
+        
+        async def run(ctx: Context):
+            # A handler may return a short notice to show as the answer toast
+            notice = await func(self, ctx)
+            await callback.answer(notice if isinstance(notice, str) else None)
+        
+        await self.pipeline.run(ctx, run)
+    
     def event(self, event_type: str):
-        """Decorator to register event handlers"""
+        """Decorator to register event handlers; member_join and member_leave
+        run through the pipeline with a Context for the chat_member update"""
         def decorator(func):
             self.events[event_type] = func
+            
+            if event_type in MEMBER_EVENTS:
+                async def run(ctx: Context):
+                    await func(self, ctx)
+                
+                async def handler(update: ChatMemberUpdated):
+                    ctx = Context(update, self)
+                    ctx.command = event_type
+                    await self.pipeline.run(ctx, run)
+                
+                self.router.chat_member.register(handler, ChatMemberUpdatedFilter(MEMBER_EVENTS[event_type]))
+            
             logger.info(f"Event '{event_type}' registered")
             return func
         return decorator
@@ -102,10 +398,65 @@ class SimpleBot:
         """Send message easily"""
         return await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
     
+    async def _startup(self):
+        """Start the background services shared by polling and webhook mode"""
+        me = await self.bot.me()
+        self.username = me.username.lower() if me.username else None
+        write_buffer.start()
+        restriction_scheduler.start()
+        change_feed.start()
+        update_scheduler.start()
+    
+    async def _shutdown(self):
+        """Finish queued updates, then stop the background services"""
+        await update_scheduler.stop()
+        await change_feed.stop()
+        await restriction_scheduler.stop()
+        await write_buffer.stop()
+        async_db.close()
+    
     async def start_polling(self):
         """Start the bot"""
         logger.info("Starting bot polling...")
-        await self.dp.start_polling(self.bot)
+        await self._startup()
+        try:
+            # Only ask Telegram for update types something handles; the scheduler
+            # does the concurrency, so the poller only queues. SIGINT/SIGTERM stop
+            # the poller and fall through to _shutdown, which drains the queues.
+            await run_until_signal(
+                update_poller.run(self.bot, self.feed, allowed_updates=self.dp.resolve_used_update_types())
+            )
+        finally:
+            await self._shutdown()
+            await self.bot.session.close()
+    
+    async def start_webhook(self, **webhook):
+        """Serve updates from a Telegram webhook; takes the config.json webhook section"""
+        logger.info("Starting bot webhook server...")
+        await self._startup()
+        try:
+            await run_until_signal(
+                serve_webhook(self.bot, self.feed, allowed_updates=self.dp.resolve_used_update_types(), **webhook)
+            )
+        finally:
+            await self._shutdown()
+            await self.bot.session.close()
+    
+    async def start_worker(self, index: int, queue, ready):
+        """Serve updates sent by the fetcher process over queue (multi-process mode)"""
+        logger.info(f"Starting bot worker {index}...")
+        await self._startup()
+        try:
+            # Tell the fetcher which update types to ask Telegram for
+            ready.put((index, self.dp.resolve_used_update_types()))
+            await consume(queue, self.bot, self.feed)
+        finally:
+            await self._shutdown()
+            await self.bot.session.close()
+    
+    async def feed(self, update: Update):
+        """Hand one update to the dispatcher (queued by the update scheduler once started)"""
+        await self.dp.feed_update(self.bot, update)
 
 # Global bot instance
 bot = None
@@ -120,13 +471,119 @@ def get_bot() -> Optional[SimpleBot]:
     """Get the current bot instance"""
     return bot
 
-# Simple event class for compatibility
-class Event:
-    def __init__(self, message: Message):
-        self.message = message
-        self.chat = message.chat
-        self.user = message.from_user
-        self.text = message.text or ""
+class Context:
+    """Per-update request context passed to every command, callback and member event.
+
+    Loads the caller's flags and record at most once per update, parses
+    arguments lazily, and forwards unknown attributes to the underlying
+    Message or CallbackQuery so handlers can keep using message.reply,
+    callback.answer, callback.from_user and friends.
+    """
+
+    __slots__ = ('bot', 'update', 'kind', 'command', 'message', 'callback', 'chat', 'user', 'params',
+                 '_args', '_flags', '_record', '_record_loaded', '_record_since')
+
+    def __init__(self, update: Union[Message, CallbackQuery, ChatMemberUpdated], bot: 'SimpleBot' = None,
+                 kind: str = None):
+        self.bot = bot
+        self.update = update
+        self.command = None
+        self.callback = None
+        self.message = None
+
+        if isinstance(update, CallbackQuery):
+            self.kind = kind or 'callback'
+            self.callback = update
+            self.message = update.message
+        elif isinstance(update, ChatMemberUpdated):
+            self.kind = kind or 'member'
+        else:
+            self.kind = kind or 'message'
+            self.message = update
+
+        self.chat = self.message.chat if self.message else getattr(update, 'chat', None)
+        self.user = update.from_user
+        self.params = {}
+
+        self._args = None
+        self._flags = None
+        self._record = None
+        self._record_loaded = False
+        self._record_since = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.update, name)
+
+    @property
+    def text(self) -> str:
+        """Message text, or callback data for callbacks"""
+        if self.callback is not None:
+            return self.callback.data or ""
+        if self.message is None:
+            return ""
+        return self.message.text or ""
+
+    @property
+    def args(self) -> List[str]:
+        """Command arguments, split on first use"""
+        if self._args is None:
+            self._args = self.text.split()[1:] if self.callback is None else []
+        return self._args
+
+    async def flags(self) -> tuple:
+        """Caller's (is_admin, is_banned, is_pro), looked up once per update"""
+        if self._flags is None:
+            if not self.user:
+                self._flags = NO_FLAGS
+            else:
+                # Fall back to the record so a cold cache costs one read, shared with get_record()
+                flags = cached_flags(self.user.id)
+                if flags is None:
+                    record = await self.get_record()
+                    # A failed lookup is not cached as "no flags"
+                    if self._record_loaded:
+                        flags = remember_flags(record, self.user.id, self._record_since)
+                    else:
+                        flags = NO_FLAGS
+                self._flags = flags
+        return self._flags
+
+    async def is_admin(self, user_id: int = None) -> bool:
+        """Check the caller (or another user) for admin"""
+        if user_id is None or (self.user and user_id == self.user.id):
+            return (await self.flags())[ADMIN]
+        return (await get_flags_async(user_id))[ADMIN] if user_id else False
+
+    async def is_banned(self, user_id: int = None) -> bool:
+        """Check the caller (or another user) for ban"""
+        if user_id is None or (self.user and user_id == self.user.id):
+            return (await self.flags())[BANNED]
+        return (await get_flags_async(user_id))[BANNED] if user_id else False
+
+    async def is_pro(self, user_id: int = None) -> bool:
+        """Check the caller (or another user) for pro"""
+        if user_id is None or (self.user and user_id == self.user.id):
+            return (await self.flags())[PRO]
+        return (await get_flags_async(user_id))[PRO] if user_id else False
+
+    async def get_record(self) -> Optional[UserRecord]:
+        """Caller's database record, fetched once per update"""
+        if not self._record_loaded:
+            if not self.user:
+                self._record = None
+            else:
+                # Flag cache generation before the read, see FlagCache.put
+                self._record_since = flag_cache.generation()
+                try:
+                    self._record = await async_db.find_user(self.user.id)
+                except Exception as e:
+                    logger.error(f"Error getting user {self.user.id}: {e}")
+                    return None
+            self._record_loaded = True
+        return self._record
+
+# Kept for modules written against the old name
+Event = Context
 
 # Helper functions for the simple syntax
 def keyboard(buttons):
@@ -164,19 +621,50 @@ class CommandHandler:
     def __init__(self):
         self.commands = {}
     
-    def add_command(self, name: str, func: Callable, help_info: Dict):
-        """Add command with help info"""
-        self.commands[name] = {
+    def add_command(self, name: str, func: Callable, help_info: Dict, timeout: float = None,
+                    max_concurrency: int = None):
+        """Add command with help info; timeout/max_concurrency override the help() values"""
+        if not help_info.get('enabled', True):
+            logger.info(f"Command '{name}' is disabled, not registering")
+            return
+
+        requires = compile_permissions(help_info.get('permissions', ['all']))
+        if requires is None:
+            logger.error(f"Command '{name}' has unknown permissions {help_info.get('permissions')}, not registering")
+            return
+
+        # The first registration of a name wins; SimpleBot reports the conflict
+        self.commands.setdefault(name, {
             'function': func,
-            'help': help_info
-        }
+            'help': help_info,
+            'requires': requires
+        })
         
         # Register with the bot
         if bot:
-            @bot.command(name, help_info.get('description', ''))
-            async def wrapper(bot_instance, message):
-                event = Event(message)
-                await func(bot_instance, event)
+            bot.command(name, help_info.get('description', ''), requires=requires,
+                        aliases=help_info.get('aliases', []),
+                        timeout=timeout if timeout is not None else help_info.get('timeout'),
+                        max_concurrency=max_concurrency if max_concurrency is not None
+                        else help_info.get('max_concurrency'))(func)
+
+def compile_permissions(permissions: Union[str, List[str]]) -> Optional[tuple]:
+    """Turn help() permission names into the flag positions a caller must have.
+
+    ["all"] compiles to an empty tuple (no check); None means a name is unknown.
+    """
+    if isinstance(permissions, str):
+        permissions = [permissions]
+
+    requires = []
+    for permission in permissions:
+        if permission == 'all':
+            continue
+        if permission not in PERMISSION_FLAGS:
+            return None
+        if PERMISSION_FLAGS[permission] not in requires:
+            requires.append(PERMISSION_FLAGS[permission])
+    return tuple(requires)
 
 # Global command handler
 handler = CommandHandler()
@@ -196,8 +684,9 @@ def load_command_module(module):
     """Load commands from a module with the simple syntax"""
     if hasattr(module, 'register'):
         module.register(handler)
+        return
     
-    # Also check for individual command functions
+    # Without register(), pick up individual *_command functions
     for attr_name in dir(module):
         attr = getattr(module, attr_name)
         if callable(attr) and attr_name.endswith('_command'):
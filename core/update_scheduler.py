@@ -0,0 +1,173 @@
+"""
+Update Scheduler - Per-chat ordered, cross-chat concurrent update processing
+Sits in front of the dispatcher as an outer update middleware. Each chat gets its
+own FIFO queue and at most one worker at a time, so a user's button presses run
+in order while a slow render in one chat never blocks the others.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Deque, List, Set, Tuple
+
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+def update_chat_key(update: Update) -> Any:
+    """Ordering key for an update: its chat, else its user, else nothing to order by"""
+    event = update.event
+    chat = getattr(event, 'chat', None)
+    if chat is None:
+        message = getattr(event, 'message', None)
+        chat = getattr(message, 'chat', None)
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, 'from_user', None) or getattr(event, 'user', None)
+    if user is not None:
+        return ('user', user.id)
+    return ('update', update.update_id)
+
+class UpdateScheduler:
+    """Runs updates in per-chat order on a capped pool of workers"""
+
+    def __init__(self, workers: int = 16, max_pending: int = 10000, stop_timeout: float = 5.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.stop_timeout = stop_timeout
+
+        # chat key -> queued (handler, update, data, queued_at); a chat is owned by one
+        # worker from the moment it enters self.ready until its queue empties
+        self.queues: Dict[Any, Deque[Tuple[Callable, Update, Dict[str, Any], float]]] = {}
+        self.ready: Optional[asyncio.Queue] = None
+        self.pending = 0
+        self._space: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[int] = set()
+
+        # Metrics
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.max_wait_ms = 0.0
+
+    def configure(self, workers: int = None, max_pending: int = None, stop_timeout: float = None):
+        """Apply settings from config"""
+        if workers is not None:
+            self.workers = workers
+        if max_pending is not None:
+            self.max_pending = max_pending
+        if stop_timeout is not None:
+            self.stop_timeout = stop_timeout
+
+    async def __call__(self, handler: Callable[[Update, Dict[str, Any]], Awaitable], update: Update,
+                       data: Dict[str, Any]) -> Any:
+        """Outer update middleware: queue the update and return to the fetcher"""
+        if not self._tasks:
+            return await handler(update, data)
+
+        # Backpressure: stop fetching while too much is waiting
+        while self.pending >= self.max_pending:
+            self._space.clear()
+            await self._space.wait()
+
+        self.submit(update_chat_key(update), handler, update, data)
+
+    def submit(self, key: Any, handler: Callable, update: Update, data: Dict[str, Any]):
+        """Append an update to its chat's queue, scheduling the chat if it was idle"""
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = deque()
+            self.ready.put_nowait(key)
+
+        queue.append((handler, update, data, time.perf_counter()))
+        self.pending += 1
+        if len(queue) > self.max_depth:
+            self.max_depth = len(queue)
+
+    async def _worker(self):
+        """Take a ready chat, run its next update, and requeue the chat if more are waiting"""
+        while True:
+            key = await self.ready.get()
+            queue = self.queues[key]
+            handler, update, data, queued_at = queue.popleft()
+
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            if wait_ms > self.max_wait_ms:
+                self.max_wait_ms = wait_ms
+
+            self._running.add(update.update_id)
+            try:
+                await handler(update, data)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error handling update {update.update_id} for chat {key}: {e}")
+            finally:
+                self._running.discard(update.update_id)
+                self.pending -= 1
+                self._space.set()
+
+                # Back of the line, so one busy chat cannot starve the rest
+                if queue:
+                    self.ready.put_nowait(key)
+                else:
+                    del self.queues[key]
+
+    def start(self):
+        """Start the worker pool"""
+        if not self._tasks:
+            self.ready = asyncio.Queue()
+            self._space = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info(f"Update scheduler started with {self.workers} workers")
+
+    async def stop(self, timeout: float = None):
+        """Finish queued updates (up to timeout, default stop_timeout seconds), then stop the workers"""
+        if not self._tasks:
+            return
+
+        deadline = time.monotonic() + (self.stop_timeout if timeout is None else timeout)
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.pending:
+            # Their offsets are already confirmed, so Telegram won't resend them
+            dropped = sorted(update.update_id for queue in self.queues.values() for _, update, _, _ in queue)
+            logger.warning(f"Update scheduler stopped with {self.pending} updates unprocessed: "
+                           f"cancelling {sorted(self._running)}, dropping queued {dropped}")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._running = set()
+        self.queues = {}
+        self.pending = 0
+
+    def depth(self, chat_id: Any) -> int:
+        """Number of updates waiting for one chat"""
+        queue = self.queues.get(chat_id)
+        return len(queue) if queue else 0
+
+    def depths(self, limit: int = 10) -> List[Tuple[Any, int]]:
+        """Deepest per-chat queues, largest first"""
+        depths = [(key, len(queue)) for key, queue in self.queues.items() if queue]
+        depths.sort(key=lambda item: item[1], reverse=True)
+        return depths[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get scheduler metrics"""
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'chats': len(self.queues),
+            'max_depth': self.max_depth,
+            'max_wait_ms': round(self.max_wait_ms, 2),
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+# Global update scheduler
+update_scheduler = UpdateScheduler()
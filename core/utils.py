@@ -2,11 +2,13 @@
 Utilities - Helper functions for the bot
 """
 
+import asyncio
 import json
 import logging
+import signal
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Awaitable
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 logger = logging.getLogger(__name__)
@@ -128,12 +130,63 @@ def extract_user_id(text: str) -> Optional[int]:
     except:
         return None
 
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_duration(text: str) -> Optional[int]:
+    """Parse a duration like 30m, 2h, 7d or 1h30m into seconds"""
+    if not text:
+        return None
+
+    total = 0
+    number = ''
+    for char in text.lower():
+        if char.isdigit():
+            number += char
+        elif char in DURATION_UNITS and number:
+            total += int(number) * DURATION_UNITS[char]
+            number = ''
+        else:
+            return None
+
+    # A bare number means minutes
+    if number:
+        total += int(number) * 60
+    return total or None
+
 class RateLimiter:
     """Simple rate limiter"""
     
     def __init__(self):
         self.user_timestamps: Dict[int, float] = {}
         self.rate_limit = 1  # 1 second default
+        
+        # Fixed-window request counting for the update pipeline
+        self.enabled = False
+        self.max_requests = 5
+        self.window_seconds = 60
+        self.windows: Dict[int, list] = {}
+    
+    def configure(self, enabled: bool = None, max_requests: int = None, window_seconds: float = None):
+        """Apply settings from config"""
+        if enabled is not None:
+            self.enabled = enabled
+        if max_requests is not None:
+            self.max_requests = max_requests
+        if window_seconds is not None:
+            self.window_seconds = window_seconds
+    
+    def hit(self, user_id: int) -> int:
+        """Count a request and return how many the user made in the current window"""
+        now = time.monotonic()
+        window = self.windows.get(user_id)
+        
+        if window is None or now - window[0] >= self.window_seconds:
+            if len(self.windows) >= 50000:
+                self.windows = {uid: w for uid, w in self.windows.items() if now - w[0] < self.window_seconds}
+            window = self.windows[user_id] = [now, 0]
+        
+        window[1] += 1
+        return window[1]
     
     def is_rate_limited(self, user_id: int, limit_seconds: int = None) -> bool:
         """Check if user is rate limited"""
@@ -182,3 +235,38 @@ def get_uptime(start_time: datetime) -> str:
         return f"{minutes}m {seconds}s"
     else:
         return f"{seconds}s"
+
+# Signals that stop the bot gracefully (systemctl stop / docker stop send SIGTERM)
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+async def run_until_signal(coro: Awaitable) -> bool:
+    """Run coro until it returns or SIGINT/SIGTERM arrives. A signal cancels it, so
+    its finally blocks run, and then returns True instead of raising."""
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(coro)
+    received = []
+
+    def stop(signum):
+        logger.info(f"Received {signal.Signals(signum).name}, shutting down")
+        received.append(signum)
+        task.cancel()
+
+    installed = []
+    for signum in STOP_SIGNALS:
+        try:
+            loop.add_signal_handler(signum, stop, signum)
+            installed.append(signum)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Windows, or not on the main thread: fall back to default handling
+            pass
+
+    try:
+        await task
+        return False
+    except asyncio.CancelledError:
+        if not received:
+            raise
+        return True
+    finally:
+        for signum in installed:
+            loop.remove_signal_handler(signum)
@@ -0,0 +1,129 @@
+"""
+Webhook Server - Receives Telegram updates over HTTPS POST via aiohttp
+Each request is validated, handed to a sink that only queues it (the update
+scheduler or a worker process) and answered right away, so Telegram never waits
+on a handler.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Recorded updates are written to disk off the event loop at most this often
+RECORD_FLUSH_INTERVAL = 1.0
+
+class WebhookServer:
+    """aiohttp app that passes webhook POSTs to a sink (the dispatcher or a worker pool)"""
+
+    def __init__(self, bot: Bot, sink: Callable[[Update], Awaitable[Any]], path: str = '/webhook',
+                 secret_token: str = None, record_path: str = None):
+        self.bot = bot
+        self.sink = sink
+        self.path = path
+        self.secret_token = secret_token or None
+        self.record_path = record_path or None
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle)
+        self._runner: Optional[web.AppRunner] = None
+        self._record = None
+        self._record_buffer: List[bytes] = []
+        self._record_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.received = 0
+        self.rejected = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Validate and queue one update, then answer 200 at once"""
+        if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+            self.rejected += 1
+            return web.Response(status=401)
+
+        body = await request.read()
+        try:
+            update = Update.model_validate_json(body, context={'bot': self.bot})
+        except Exception as e:
+            self.rejected += 1
+            logger.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+
+        if self._record is not None:
+            # Raw bytes, one update per line; JSON only has newlines as whitespace
+            self._record_buffer.append(body.replace(b'\r', b' ').replace(b'\n', b' ') + b'\n')
+
+        self.received += 1
+        await self.sink(update)
+        return web.Response()
+
+    async def start(self, host: str = '0.0.0.0', port: int = 8080):
+        """Start listening"""
+        if self.record_path:
+            self._record = open(self.record_path, 'ab')
+            self._record_task = asyncio.create_task(self._record_loop())
+
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook server listening on {host}:{port}{self.path}")
+
+    async def _record_loop(self):
+        """Write recorded updates in batches on the default executor"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(RECORD_FLUSH_INTERVAL)
+            if self._record_buffer:
+                batch, self._record_buffer = self._record_buffer, []
+                try:
+                    await loop.run_in_executor(None, self._write_record, batch)
+                except Exception as e:
+                    logger.error(f"Failed to record {len(batch)} webhook updates: {e}")
+
+    def _write_record(self, batch: List[bytes]):
+        self._record.write(b''.join(batch))
+        self._record.flush()
+
+    async def stop(self):
+        """Stop listening, write what is left to record and close the file"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._record_task is not None:
+            self._record_task.cancel()
+            await asyncio.gather(self._record_task, return_exceptions=True)
+            self._record_task = None
+        if self._record is not None:
+            batch, self._record_buffer = self._record_buffer, []
+            self._write_record(batch)
+            self._record.close()
+            self._record = None
+
+    def stats(self):
+        """Get server metrics"""
+        return {
+            'received': self.received,
+            'rejected': self.rejected
+        }
+
+async def serve_webhook(bot: Bot, sink: Callable[[Update], Awaitable[Any]], allowed_updates: List[str] = None,
+                        url: str = "", host: str = "0.0.0.0", port: int = 8080, path: str = "/webhook",
+                        secret_token: str = "", max_connections: int = 40, record_path: str = ""):
+    """Serve until cancelled; an empty url skips setWebhook (local testing)"""
+    server = WebhookServer(bot, sink, path, secret_token, record_path)
+    try:
+        await server.start(host, port)
+        if url:
+            await bot.set_webhook(url.rstrip('/') + path, secret_token=secret_token or None,
+                                  max_connections=max_connections, allowed_updates=allowed_updates)
+            logger.info(f"Webhook set to {url.rstrip('/')}{path}")
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
@@ -0,0 +1,160 @@
+"""
+Write Buffer - Write-behind batching of user upserts and command counters
+Coalesces user updates and command use counts in memory and flushes them in
+one transaction every few hundred milliseconds (or sooner when enough rows pile up).
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from .async_database import async_db, AsyncDatabase
+from .database import ProfileCache
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Coalesces per-user upserts and flushes them with executemany"""
+
+    def __init__(self, database: AsyncDatabase, interval_ms: int = 500, max_rows: int = 500):
+        self.database = database
+        self.interval_ms = interval_ms
+        self.max_rows = max_rows
+
+        self.pending: Dict[int, tuple] = {}
+        self.touched: Dict[int, datetime] = {}
+        self.commands: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        # Metrics
+        self.flush_count = 0
+        self.rows_flushed = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def configure(self, interval_ms: int = None, max_rows: int = None):
+        """Apply settings from config"""
+        if interval_ms is not None:
+            self.interval_ms = interval_ms
+        if max_rows is not None:
+            self.max_rows = max_rows
+
+    def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+        """Queue a user upsert; later calls for the same user replace earlier ones"""
+        action = self.database.db.profiles.check(user_id, (username, first_name, last_name))
+        if action == ProfileCache.SKIP:
+            self.skipped += 1
+            return
+
+        now = datetime.now()
+
+        if action == ProfileCache.UPSERT:
+            if user_id in self.pending:
+                self.coalesced += 1
+            self.pending[user_id] = (user_id, username, first_name, last_name, now)
+            self.touched.pop(user_id, None)
+        elif user_id in self.pending:
+            self.coalesced += 1
+            self.pending[user_id] = self.pending[user_id][:4] + (now,)
+        else:
+            self.touched[user_id] = now
+
+        if self.queue_depth() >= self.max_rows and self._wakeup:
+            self._wakeup.set()
+
+    def count_command(self, name: str):
+        """Count one use of a command"""
+        self.commands[name] = self.commands.get(name, 0) + 1
+
+    def queue_depth(self) -> int:
+        """Number of users waiting to be written"""
+        return len(self.pending) + len(self.touched)
+
+    async def flush(self) -> int:
+        """Write all pending rows in a single transaction"""
+        if not self.pending and not self.touched and not self.commands:
+            return 0
+
+        rows, self.pending = list(self.pending.values()), {}
+        touches, self.touched = [(seen, user_id) for user_id, seen in self.touched.items()], {}
+        commands, self.commands = self.commands, {}
+        start = time.perf_counter()
+
+        try:
+            await self.database.write(self.database.db.write_batch, rows, touches, commands)
+        except Exception as e:
+            logger.error(f"Error flushing {len(rows) + len(touches)} user updates: {e}")
+            # Put rows back unless a newer update arrived meanwhile
+            for row in rows:
+                self.pending.setdefault(row[0], row)
+            for seen, user_id in touches:
+                if user_id not in self.pending:
+                    self.touched.setdefault(user_id, seen)
+            for name, uses in commands.items():
+                self.commands[name] = self.commands.get(name, 0) + uses
+            return 0
+
+        elapsed = (time.perf_counter() - start) * 1000
+        written = len(rows) + len(touches)
+        self.flush_count += 1
+        self.rows_flushed += written
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self.total_flush_ms += elapsed
+
+        return written
+
+    async def _run(self):
+        """Flush loop; exits after the current flush once stop() is called"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the background flush loop"""
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Write buffer started ({self.interval_ms}ms / {self.max_rows} rows)")
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is left"""
+        if self._task is not None:
+            # No cancel(): a flush in progress has already taken the rows out of
+            # the buffer, so let it finish instead of dropping its batch
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        flushed = await self.flush()
+        logger.info(f"Write buffer stopped, flushed {flushed} pending rows")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get buffer metrics"""
+        return {
+            'queue_depth': self.queue_depth(),
+            'flushes': self.flush_count,
+            'rows_flushed': self.rows_flushed,
+            'coalesced': self.coalesced,
+            'skipped': self.skipped,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'avg_flush_ms': round(self.total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0
+        }
+
+# Global write buffer instance
+write_buffer = WriteBehindBuffer(async_db)
@@ -2,19 +2,34 @@
 Admin Commands - User management and bot control
 """
 
-from core import is_admin, ban_user, unban_user, add_admin, db
+import re
+
+from core import (
+    ban_users, unban_users, mute_user_async, unmute_user_async, add_admin_async,
+    async_db, write_buffer, restriction_scheduler, update_scheduler, parse_duration, format_time
+)
+
+# Largest replied-to id list /ban and /unban will download
+MAX_ID_FILE_SIZE = 1024 * 1024
+
+# Most ids one file may supply, and the file kinds read as id lists
+MAX_FILE_IDS = 10000
+ID_FILE_EXTENSIONS = ('.txt', '.csv')
 
 def ban_help():
     """Ban command help information"""
     return {
         "name": "ban",
         "description": "Ban a user from using the bot",
-        "usage": "/ban [reply to user] or /ban <user_id>",
+        "usage": "/ban [reply to user or id file] [duration] or /ban <user_id> [user_id...] [duration]",
         "aliases": ["ban", "block"],
         "category": "admin",
         "examples": [
             "/ban (reply to message)",
-            "/ban 123456789"
+            "/ban 123456789",
+            "/ban 123456789 2h",
+            "/ban 111 222 333",
+            "/ban (reply to a .txt file of ids) 7d"
         ],
         "permissions": ["admin"],
         "enabled": True
@@ -25,12 +40,45 @@ def unban_help():
     return {
         "name": "unban",
         "description": "Unban a user from the bot",
-        "usage": "/unban [reply to user] or /unban <user_id>",
+        "usage": "/unban [reply to user or id file] or /unban <user_id> [user_id...]",
         "aliases": ["unban", "unblock"],
         "category": "admin",
         "examples": [
             "/unban (reply to message)",
-            "/unban 123456789"
+            "/unban 123456789",
+            "/unban 111 222 333"
+        ],
+        "permissions": ["admin"],
+        "enabled": True
+    }
+
+def mute_help():
+    """Mute command help information"""
+    return {
+        "name": "mute",
+        "description": "Ignore a user's commands, optionally for a while",
+        "usage": "/mute [reply to user] [duration] or /mute <user_id> [duration]",
+        "aliases": ["mute", "silence"],
+        "category": "admin",
+        "examples": [
+            "/mute (reply to message) 30m",
+            "/mute 123456789 1d"
+        ],
+        "permissions": ["admin"],
+        "enabled": True
+    }
+
+def unmute_help():
+    """Unmute command help information"""
+    return {
+        "name": "unmute",
+        "description": "Unmute a user",
+        "usage": "/unmute [reply to user] or /unmute <user_id>",
+        "aliases": ["unmute"],
+        "category": "admin",
+        "examples": [
+            "/unmute (reply to message)",
+            "/unmute 123456789"
         ],
         "permissions": ["admin"],
         "enabled": True
@@ -67,81 +115,141 @@ def stats_help():
         "enabled": True
     }
 
-async def ban_command(bot, event):
-    """Ban a user from using the bot"""
-    if not is_admin(event.user.id):
-        await bot.send_message(event.chat.id, "❌ Admin only.")
-        return
+def is_id_file(document) -> bool:
+    """Check if a document is a plain text id list (not a PDF, APK, image...)"""
+    name = (document.file_name or '').lower()
+    return document.mime_type == 'text/plain' or name.endswith(ID_FILE_EXTENSIONS)
 
-    # Get target user ID
-    target_id = None
-    if hasattr(event.message, 'reply_to_message') and event.message.reply_to_message:
-        target_id = event.message.reply_to_message.from_user.id
+async def read_id_file(bot, document):
+    """Download a replied-to text file and pull the user ids out of it"""
+    if document.file_size and document.file_size > MAX_ID_FILE_SIZE:
+        return None
+
+    data = await bot.bot.download(document)
+    ids = [int(user_id) for user_id in re.findall(rb'-?\d+', data.read())]
+    return [user_id for user_id in ids if user_id > 0]
+
+async def get_targets(bot, event, command: str, timed: bool = True):
+    """Get (target_ids, duration) from a reply, a replied-to file of ids, or
+    /command <user_id> [user_id...] [duration].
+    Returns ([], None) after telling the user what was wrong."""
+    args = list(event.args)
+    reply = getattr(event.message, 'reply_to_message', None)
+    duration = None
+
+    if reply and not (reply.document and is_id_file(reply.document)):
+        target_ids = [reply.from_user.id]
+        duration_arg = args[0] if args else None
     else:
-        args = event.text.split()[1:] if event.text else []
-        if args:
+        # A trailing non-numeric argument is the duration
+        duration_arg = args.pop() if timed and args and not args[-1].isdigit() else None
+
+        if reply:
+            target_ids = await read_id_file(bot, reply.document)
+            if target_ids is None:
+                await bot.send_message(event.chat.id, "❌ File too large (max 1 MB).")
+                return [], None
+            if len(target_ids) > MAX_FILE_IDS:
+                await bot.send_message(event.chat.id, f"❌ Too many IDs in file (max {MAX_FILE_IDS:,}).")
+                return [], None
+        else:
             try:
-                target_id = int(args[0])
+                target_ids = [int(arg) for arg in args]
+                if any(target_id <= 0 for target_id in target_ids):
+                    raise ValueError
             except ValueError:
                 await bot.send_message(event.chat.id, "❌ Invalid user ID.")
-                return
+                return [], None
 
-    if not target_id:
-        await bot.send_message(event.chat.id, "❌ Reply to user or use /ban <user_id>")
-        return
+    if not target_ids:
+        await bot.send_message(event.chat.id, f"❌ Reply to user or use /{command} <user_id>")
+        return [], None
 
-    if is_admin(target_id):
-        await bot.send_message(event.chat.id, "❌ Cannot ban admin.")
+    if timed and duration_arg:
+        duration = parse_duration(duration_arg)
+        if not duration:
+            await bot.send_message(event.chat.id, "❌ Invalid duration. Use e.g. 30m, 2h, 7d or 1h30m.")
+            return [], None
+
+    return target_ids, duration
+
+async def ban_command(bot, event):
+    """Ban one or many users from using the bot, optionally for a while"""
+    target_ids, duration = await get_targets(bot, event, "ban")
+    if not target_ids:
         return
 
-    if ban_user(target_id):
-        await bot.send_message(event.chat.id, f"✅ User {target_id} banned.")
-    else:
+    admins = {target_id for target_id in target_ids if await event.is_admin(target_id)}
+    if admins:
+        target_ids = [target_id for target_id in target_ids if target_id not in admins]
+        if not target_ids:
+            await bot.send_message(event.chat.id, "❌ Cannot ban admin.")
+            return
+
+    banned = await ban_users(target_ids, duration)
+    until = f" for {format_time(duration)}" if duration else ""
+
+    if not banned:
         await bot.send_message(event.chat.id, "❌ Failed to ban user.")
+    elif len(target_ids) == 1 and not admins:
+        await bot.send_message(event.chat.id, f"✅ User {target_ids[0]} banned{until}.")
+    else:
+        skipped = f" ({len(admins)} admins skipped)" if admins else ""
+        await bot.send_message(event.chat.id, f"✅ Banned {banned:,} users{until}{skipped}.")
 
-async def unban_command(bot, event):
-    """Unban a user"""
-    if not is_admin(event.user.id):
-        await bot.send_message(event.chat.id, "❌ Admin only.")
+async def mute_command(bot, event):
+    """Mute a user, optionally for a while"""
+    target_ids, duration = await get_targets(bot, event, "mute")
+    if not target_ids:
         return
+    target_id = target_ids[0]
 
-    # Get target user ID (same logic as ban)
-    target_id = None
-    if hasattr(event.message, 'reply_to_message') and event.message.reply_to_message:
-        target_id = event.message.reply_to_message.from_user.id
+    if await event.is_admin(target_id):
+        await bot.send_message(event.chat.id, "❌ Cannot mute admin.")
+        return
+
+    if await mute_user_async(target_id, duration):
+        until = f" for {format_time(duration)}" if duration else ""
+        await bot.send_message(event.chat.id, f"🔇 User {target_id} muted{until}.")
     else:
-        args = event.text.split()[1:] if event.text else []
-        if args:
-            try:
-                target_id = int(args[0])
-            except ValueError:
-                await bot.send_message(event.chat.id, "❌ Invalid user ID.")
-                return
+        await bot.send_message(event.chat.id, "❌ Failed to mute user.")
 
-    if not target_id:
-        await bot.send_message(event.chat.id, "❌ Reply to user or use /unban <user_id>")
+async def unmute_command(bot, event):
+    """Unmute a user"""
+    target_ids, _ = await get_targets(bot, event, "unmute", timed=False)
+    if not target_ids:
         return
+    target_id = target_ids[0]
 
-    if unban_user(target_id):
-        await bot.send_message(event.chat.id, f"✅ User {target_id} unbanned.")
+    if await unmute_user_async(target_id):
+        await bot.send_message(event.chat.id, f"🔊 User {target_id} unmuted.")
     else:
+        await bot.send_message(event.chat.id, "❌ Failed to unmute user.")
+
+async def unban_command(bot, event):
+    """Unban one or many users"""
+    target_ids, _ = await get_targets(bot, event, "unban", timed=False)
+    if not target_ids:
+        return
+
+    unbanned = await unban_users(target_ids)
+    if not unbanned:
         await bot.send_message(event.chat.id, "❌ Failed to unban user.")
+    elif len(target_ids) == 1:
+        await bot.send_message(event.chat.id, f"✅ User {target_ids[0]} unbanned.")
+    else:
+        await bot.send_message(event.chat.id, f"✅ Unbanned {unbanned:,} users.")
 
 async def addadmin_command(bot, event):
     """Add a user as admin"""
-    if not is_admin(event.user.id):
-        await bot.send_message(event.chat.id, "❌ Admin only.")
-        return
-
     # Get target user ID
     target_id = None
     if hasattr(event.message, 'reply_to_message') and event.message.reply_to_message:
         target_id = event.message.reply_to_message.from_user.id
     else:
-        args = event.text.split()[1:] if event.text else []
-        if args:
+        if event.args:
             try:
-                target_id = int(args[0])
+                target_id = int(event.args[0])
             except ValueError:
                 await bot.send_message(event.chat.id, "❌ Invalid user ID.")
                 return
@@ -150,22 +258,23 @@ async def addadmin_command(bot, event):
         await bot.send_message(event.chat.id, "❌ Reply to user or use /addadmin <user_id>")
         return
 
-    if add_admin(target_id):
+    if await add_admin_async(target_id):
         await bot.send_message(event.chat.id, f"✅ User {target_id} is now admin.")
     else:
         await bot.send_message(event.chat.id, "❌ Failed to add admin.")
 
 async def stats_command(bot, event):
     """Show bot statistics"""
-    if not is_admin(event.user.id):
-        await bot.send_message(event.chat.id, "❌ Admin only.")
-        return
-
-    total_users = db.get_user_count()
-    all_users = db.get_all_users()
-
-    admin_count = len([u for u in all_users if u['is_admin']])
-    banned_count = len([u for u in all_users if u['is_banned']])
+    stats = await async_db.get_stats()
+    total_users = stats['total']
+    admin_count = stats['admins']
+    banned_count = stats['banned']
+    buffer_stats = write_buffer.stats()
+    scheduler_stats = update_scheduler.stats()
+    top_commands = await async_db.get_command_stats(limit=5)
+    top_text = "\n".join(f"• /{name} - {uses}" for name, uses, _ in top_commands) or "• None yet"
+    stage_text = "\n".join(f"• {name} - {stage['avg_ms']}ms avg, {stage['max_ms']}ms max"
+                           for name, stage in bot.pipeline.stats().items() if stage['calls'])
 
     text = f"""
 <b>📊 Bot Statistics</b>
@@ -174,6 +283,20 @@ async def stats_command(bot, event):
 <b>Active:</b> {total_users - banned_count}
 <b>Banned:</b> {banned_count}
 <b>Admins:</b> {admin_count}
+<b>Pro:</b> {stats['pro']}
+
+<b>Commands Run:</b> {stats['commands']}
+<b>Top Commands:</b>
+{top_text}
+
+<b>Timed Restrictions:</b> {restriction_scheduler.stats()['pending']} pending
+
+<b>Write Queue:</b> {buffer_stats['queue_depth']} pending
+<b>Last Flush:</b> {buffer_stats['last_flush_ms']}ms (max {buffer_stats['max_flush_ms']}ms)
+
+<b>Update Queue:</b> {scheduler_stats['pending']} pending in {scheduler_stats['chats']} chats (max depth {scheduler_stats['max_depth']})
+<b>Update Latency:</b>
+{stage_text}
 
 <b>Status:</b> ✅ Online
 <b>Version:</b> 3.0.0
@@ -184,5 +307,7 @@ async def stats_command(bot, event):
 def register(handler):
     handler.add_command("ban", ban_command, ban_help())
     handler.add_command("unban", unban_command, unban_help())
+    handler.add_command("mute", mute_command, mute_help())
+    handler.add_command("unmute", unmute_command, unmute_help())
     handler.add_command("addadmin", addadmin_command, addadmin_help())
     handler.add_command("stats", stats_command, stats_help())
@@ -3,7 +3,7 @@ Example Commands - Template for creating new commands
 This file shows the simple syntax structure for Grandpa™ ORG
 """
 
-from core import keyboard, is_admin, is_banned
+from core import keyboard
 import random
 import time
 
@@ -78,7 +78,7 @@ async def demo_command(bot, event):
     """
     
     # Get command arguments
-    args = event.text.split()[1:] if event.text else []
+    args = event.args
     
     if not args:
         help_text = """
@@ -153,15 +153,7 @@ async def admin_example_command(bot, event):
     
     user = event.user
     
-    # Check if user is admin (manual check)
-    if not is_admin(user.id):
-        await bot.send_message(event.chat.id, "❌ This command requires admin privileges.")
-        return
-    
-    # Check if user is banned (optional check)
-    if is_banned(user.id):
-        await bot.send_message(event.chat.id, "❌ You are banned from using this bot.")
-        return
+    # Admin and ban checks are done by the registry from "permissions"
     
     admin_response = f"""
 👑 <b>Admin Command Example</b>
@@ -251,8 +243,8 @@ def register(handler):
     handler.add_command("demo", demo_command, {"description": "Demo command with arguments"})
     handler.add_command("test", test_command, {"description": "Test command with buttons"})
     
-    # Register admin command (note: admin check is done inside the function)
-    handler.add_command("adminexample", admin_example_command, {"description": "Admin example (Admin only)"})
+    # Register admin command (the "permissions" entry restricts it to admins)
+    handler.add_command("adminexample", admin_example_command, {"description": "Admin example (Admin only)", "permissions": ["admin"]})
     
     # Register fun command
     handler.add_command("fun", fun_command, {"description": "Fun command with random responses"})
@@ -289,7 +281,7 @@ def register(handler):
 # 5. Use bot.send_message() to send responses
 # 6. Use keyboard() function for interactive buttons
 # 7. Create register() function to register all commands
-# 8. Add admin checks manually if needed
+# 8. Set "permissions": ["admin"] for admin-only commands
 #
 # That's it! Super simple and clean! 🚀
 # ============================================================================
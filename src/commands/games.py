@@ -2,7 +2,8 @@
 Games Commands - Fun games with visual responses
 """
 
-from core import keyboard, is_admin
+from core import keyboard, is_admin, get_bot
+from aiogram.types import BufferedInputFile, InputMediaPhoto
 from PIL import Image, ImageDraw, ImageFont
 import io
 import random
@@ -18,13 +19,15 @@ def help():
         "name": "games",
         "description": "Fun games with visual responses",
         "usage": "/ttt, /tictactoe",
-        "aliases": ["games", "play", "fun"],
+        "aliases": ["tictactoe", "games", "play", "fun"],
         "category": "fun",
         "examples": [
             "/ttt",
             "/tictactoe"
         ],
         "permissions": ["all"],
+        "timeout": 20,
+        "max_concurrency": 8,
         "enabled": True
     }
 
@@ -131,6 +134,32 @@ def get_ai_move(board):
     
     return random.choice(available) if available else None
 
+def to_photo(img, filename):
+    """Encode a Pillow image as an uploadable PNG"""
+    bio = io.BytesIO()
+    img.save(bio, format='PNG')
+    return BufferedInputFile(bio.getvalue(), filename=filename)
+
+def ttt_keyboard(game_id, board, finished=False):
+    """Board buttons plus New Game / Quit"""
+    marks = {' ': "⬜", 'X': "❌", 'O': "⭕"}
+    buttons = []
+    if not finished:
+        for row in range(3):
+            button_row = []
+            for col in range(3):
+                button_row.append({
+                    "text": marks[board[row][col]],
+                    "callback_data": f"ttt_{game_id}_{row}_{col}"
+                })
+            buttons.append(button_row)
+
+    buttons.append([
+        {"text": "🔄 New Game", "callback_data": f"ttt_new_{game_id}"},
+        {"text": "❌ Quit", "callback_data": f"ttt_quit_{game_id}"}
+    ])
+    return keyboard(buttons)
+
 async def ttt_command(bot, event):
     """Start a new tic-tac-toe game"""
     user = event.user
@@ -148,31 +177,7 @@ async def ttt_command(bot, event):
         'vs_ai': True
     }
     
-    # Create board image
-    img = create_ttt_board_image(board)
-    
-    # Convert to bytes
-    bio = io.BytesIO()
-    img.save(bio, format='PNG')
-    bio.seek(0)
-    
-    # Create game buttons
-    buttons = []
-    for row in range(3):
-        button_row = []
-        for col in range(3):
-            button_row.append({
-                "text": "⬜",
-                "callback_data": f"ttt_{game_id}_{row}_{col}"
-            })
-        buttons.append(button_row)
-    
-    buttons.append([
-        {"text": "🔄 New Game", "callback_data": f"ttt_new_{game_id}"},
-        {"text": "❌ Quit", "callback_data": f"ttt_quit_{game_id}"}
-    ])
-    
-    kb = keyboard(buttons)
+    kb = ttt_keyboard(game_id, board)
     
     caption = f"""
 🎮 <b>Tic-Tac-Toe Game</b>
@@ -188,7 +193,7 @@ async def ttt_command(bot, event):
     # Send game image with buttons
     await bot.bot.send_photo(
         chat_id,
-        bio,
+        to_photo(create_ttt_board_image(board), "ttt.png"),
         caption=caption.strip(),
         reply_markup=kb,
         parse_mode='HTML'
@@ -302,14 +307,6 @@ async def guess_command(bot, event):
         'max_attempts': 10
     }
 
-    # Create game image
-    img = create_guess_game_image([], [], (1, 100))
-
-    # Convert to bytes
-    bio = io.BytesIO()
-    img.save(bio, format='PNG')
-    bio.seek(0)
-
     caption = f"""
 🎯 <b>Number Guessing Game Started!</b>
 
@@ -331,7 +328,7 @@ Can you guess what it is?
     # Send game image
     await bot.bot.send_photo(
         chat_id,
-        bio,
+        to_photo(create_guess_game_image([], [], (1, 100)), "guess.png"),
         caption=caption.strip(),
         parse_mode='HTML'
     )
@@ -378,22 +375,7 @@ async def rock_paper_scissors_command(bot, event):
         draw.text((200, y_pos + 5), f"- {desc}", font=text_font, fill=(150, 150, 150))
         y_pos += 40
 
-    # Convert to bytes
-    bio = io.BytesIO()
-    img.save(bio, format='PNG')
-    bio.seek(0)
-
-    # Create buttons
-    buttons = [
-        [
-            {"text": "🪨 Rock", "callback_data": f"rps_{user.id}_rock"},
-            {"text": "📄 Paper", "callback_data": f"rps_{user.id}_paper"},
-            {"text": "✂️ Scissors", "callback_data": f"rps_{user.id}_scissors"}
-        ],
-        [{"text": "🔄 New Game", "callback_data": f"rps_new_{user.id}"}]
-    ]
-
-    kb = keyboard(buttons)
+    kb = rps_keyboard(user.id)
 
     caption = f"""
 ✂️ <b>Rock Paper Scissors</b>
@@ -413,14 +395,149 @@ Choose your move and let's see who wins!
 
     await bot.bot.send_photo(
         event.chat.id,
-        bio,
+        to_photo(img, "rps.png"),
         caption=caption.strip(),
         reply_markup=kb,
         parse_mode='HTML'
     )
 
+def rps_keyboard(user_id):
+    """Rock / Paper / Scissors buttons for one player"""
+    return keyboard([
+        [
+            {"text": "🪨 Rock", "callback_data": f"rps_{user_id}_rock"},
+            {"text": "📄 Paper", "callback_data": f"rps_{user_id}_paper"},
+            {"text": "✂️ Scissors", "callback_data": f"rps_{user_id}_scissors"}
+        ],
+        [{"text": "🔄 New Game", "callback_data": f"rps_new_{user_id}"}]
+    ])
+
+# ============================================================================
+# CALLBACKS - routed by pattern, parsed values arrive in event.params
+# ============================================================================
+
+TTT_CAPTIONS = {
+    'X': "🎉 <b>You win!</b>",
+    'O': "🤖 <b>AI wins!</b>",
+    None: "🤝 <b>It's a draw!</b>"
+}
+
+async def ttt_move_callback(bot, event):
+    """Play a cell, then let the AI answer"""
+    game_id = f"{event.params['chat']}_{event.params['uid']}"
+    game = active_games.get(game_id)
+    if not game:
+        return "Game over. Press New Game to play again."
+    if event.user.id != game['user_id']:
+        return "This isn't your game!"
+
+    board = game['board']
+    row, col = event.params['row'], event.params['col']
+    if row > 2 or col > 2 or board[row][col] != ' ':
+        return "That cell is taken."
+
+    board[row][col] = 'X'
+    winner, line = check_winner(board)
+    if not winner and not is_board_full(board):
+        ai_row, ai_col = get_ai_move(board)
+        board[ai_row][ai_col] = 'O'
+        winner, line = check_winner(board)
+
+    finished = bool(winner) or is_board_full(board)
+    if finished:
+        active_games.pop(game_id, None)
+        caption = TTT_CAPTIONS[winner]
+    else:
+        caption = "🎮 <b>Tic-Tac-Toe</b>\n\n<b>Your turn!</b>"
+
+    await event.message.edit_media(
+        InputMediaPhoto(media=to_photo(create_ttt_board_image(board, winner, line), "ttt.png"),
+                        caption=caption, parse_mode='HTML'),
+        reply_markup=ttt_keyboard(game_id, board, finished)
+    )
+
+async def ttt_new_callback(bot, event):
+    """Restart the board in place"""
+    if event.user.id != event.params['uid']:
+        return "This isn't your game!"
+
+    game_id = f"{event.params['chat']}_{event.params['uid']}"
+    board = [[' ' for _ in range(3)] for _ in range(3)]
+    active_games[game_id] = {
+        'board': board,
+        'current_player': 'X',
+        'user_id': event.params['uid'],
+        'chat_id': event.params['chat'],
+        'vs_ai': True
+    }
+
+    await event.message.edit_media(
+        InputMediaPhoto(media=to_photo(create_ttt_board_image(board), "ttt.png"),
+                        caption="🎮 <b>Tic-Tac-Toe</b>\n\n<b>Your turn!</b>", parse_mode='HTML'),
+        reply_markup=ttt_keyboard(game_id, board)
+    )
+
+async def ttt_quit_callback(bot, event):
+    """End the game and drop the buttons"""
+    if event.user.id != event.params['uid']:
+        return "This isn't your game!"
+
+    active_games.pop(f"{event.params['chat']}_{event.params['uid']}", None)
+    await event.message.edit_caption(caption="❌ <b>Game ended.</b>", parse_mode='HTML')
+
+RPS_BEATS = {'rock': 'scissors', 'paper': 'rock', 'scissors': 'paper'}
+RPS_EMOJI = {'rock': "🪨", 'paper': "📄", 'scissors': "✂️"}
+
+async def rps_choice_callback(bot, event):
+    """Resolve one round against a random AI pick"""
+    choice = event.params['choice']
+    if choice not in RPS_BEATS:
+        return None
+    if event.user.id != event.params['uid']:
+        return "This isn't your game!"
+
+    ai_choice = random.choice(list(RPS_BEATS))
+    if choice == ai_choice:
+        result = "🤝 <b>It's a draw!</b>"
+    elif RPS_BEATS[choice] == ai_choice:
+        result = "🎉 <b>You win!</b>"
+    else:
+        result = "🤖 <b>AI wins!</b>"
+
+    caption = f"""
+✂️ <b>Rock Paper Scissors</b>
+
+<b>You:</b> {RPS_EMOJI[choice]} {choice.title()}
+<b>AI:</b> {RPS_EMOJI[ai_choice]} {ai_choice.title()}
+
+{result}
+    """
+    await event.message.edit_caption(
+        caption=caption.strip(),
+        reply_markup=keyboard([[{"text": "🔄 New Game", "callback_data": f"rps_new_{event.params['uid']}"}]]),
+        parse_mode='HTML'
+    )
+
+async def rps_new_callback(bot, event):
+    """Offer the choices again"""
+    if event.user.id != event.params['uid']:
+        return "This isn't your game!"
+
+    await event.message.edit_caption(
+        caption="✂️ <b>Rock Paper Scissors</b>\n\nChoose your move!",
+        reply_markup=rps_keyboard(event.params['uid']),
+        parse_mode='HTML'
+    )
+
 def register(handler):
     handler.add_command("ttt", ttt_command, help())
-    handler.add_command("tictactoe", ttt_command, {"description": "Play tic-tac-toe game"})
     handler.add_command("guess", guess_command, {"description": "Number guessing game"})
     handler.add_command("rps", rock_paper_scissors_command, {"description": "Rock Paper Scissors game"})
+
+    bot = get_bot()
+    if bot:
+        bot.callback("ttt_{chat:int}_{uid:int}_{row:int}_{col:int}")(ttt_move_callback)
+        bot.callback("ttt_new_{chat:int}_{uid:int}")(ttt_new_callback)
+        bot.callback("ttt_quit_{chat:int}_{uid:int}")(ttt_quit_callback)
+        bot.callback("rps_{uid:int}_{choice}")(rps_choice_callback)
+        bot.callback("rps_new_{uid:int}")(rps_new_callback)
@@ -20,6 +20,7 @@ def help():
             "/uid (reply to message)"
         ],
         "permissions": ["all"],
+        "timeout": 15,
         "enabled": True
     }
 
@@ -3,6 +3,7 @@ Member Events - Handle user join/leave with visual cards
 """
 
 from core import get_bot
+from aiogram.types import BufferedInputFile
 from PIL import Image, ImageDraw, ImageFont
 import io
 import requests
@@ -14,6 +15,9 @@ def register_events(dp):
     
     if not bot:
         return
+    
+    bot.event('member_join')(handle_new_member)
+    bot.event('member_leave')(handle_left_member)
 
 def create_welcome_card(user_name, user_username, chat_title, member_count, profile_photo_url=None):
     """Create a welcome card for new members"""
@@ -213,49 +217,48 @@ def create_goodbye_card(user_name, user_username, chat_title, member_count):
     
     return img
 
-async def handle_new_member(bot, message):
+async def handle_new_member(bot, event):
     """Handle new member joining"""
-    new_members = message.new_chat_members
-    chat = message.chat
-    
-    for member in new_members:
-        if member.is_bot:
-            continue  # Skip bots
-        
-        # Get member count
-        try:
-            chat_info = await bot.bot.get_chat(chat.id)
-            member_count = getattr(chat_info, 'member_count', 'Unknown')
-        except:
-            member_count = 'Unknown'
-        
-        # Get profile photo URL
-        profile_photo_url = None
-        try:
-            photos = await bot.bot.get_user_profile_photos(member.id, limit=1)
-            if photos.total_count > 0:
-                photo = photos.photos[0][-1]  # Get largest photo
-                file_info = await bot.bot.get_file(photo.file_id)
-                profile_photo_url = f"https://api.telegram.org/file/bot{bot.bot.token}/{file_info.file_path}"
-        except:
-            pass
-        
-        # Create welcome card
-        welcome_img = create_welcome_card(
-            user_name=member.first_name or "New Member",
-            user_username=member.username,
-            chat_title=chat.title or "Group",
-            member_count=member_count,
-            profile_photo_url=profile_photo_url
-        )
-        
-        # Convert to bytes
-        bio = io.BytesIO()
-        welcome_img.save(bio, format='PNG')
-        bio.seek(0)
-        
-        # Send welcome card
-        caption = f"""
+    member = event.update.new_chat_member.user
+    chat = event.chat
+    
+    if member.is_bot:
+        return  # Skip bots
+    
+    # Get member count
+    try:
+        chat_info = await bot.bot.get_chat(chat.id)
+        member_count = getattr(chat_info, 'member_count', 'Unknown')
+    except:
+        member_count = 'Unknown'
+    
+    # Get profile photo URL
+    profile_photo_url = None
+    try:
+        photos = await bot.bot.get_user_profile_photos(member.id, limit=1)
+        if photos.total_count > 0:
+            photo = photos.photos[0][-1]  # Get largest photo
+            file_info = await bot.bot.get_file(photo.file_id)
+            profile_photo_url = f"https://api.telegram.org/file/bot{bot.bot.token}/{file_info.file_path}"
+    except:
+        pass
+    
+    # Create welcome card
+    welcome_img = create_welcome_card(
+        user_name=member.first_name or "New Member",
+        user_username=member.username,
+        chat_title=chat.title or "Group",
+        member_count=member_count,
+        profile_photo_url=profile_photo_url
+    )
+    
+    # Convert to bytes
+    bio = io.BytesIO()
+    welcome_img.save(bio, format='PNG')
+    photo = BufferedInputFile(bio.getvalue(), filename="welcome.png")
+    
+    # Send welcome card
+    caption = f"""
 🎉 <b>Welcome to {chat.title}!</b>
 
 Hello {member.first_name}! We're glad to have you here.
@@ -266,19 +269,19 @@ Hello {member.first_name}! We're glad to have you here.
 • Have fun and enjoy your stay!
 
 <i>Welcome aboard! 🚀</i>
-        """
-        
-        await bot.bot.send_photo(
-            chat.id,
-            bio,
-            caption=caption.strip(),
-            parse_mode='HTML'
-        )
+    """
+    
+    await bot.bot.send_photo(
+        chat.id,
+        photo,
+        caption=caption.strip(),
+        parse_mode='HTML'
+    )
 
-async def handle_left_member(bot, message):
+async def handle_left_member(bot, event):
     """Handle member leaving"""
-    left_member = message.left_chat_member
-    chat = message.chat
+    left_member = event.update.new_chat_member.user
+    chat = event.chat
     
     if left_member.is_bot:
         return  # Skip bots
@@ -301,7 +304,7 @@ async def handle_left_member(bot, message):
     # Convert to bytes
     bio = io.BytesIO()
     goodbye_img.save(bio, format='PNG')
-    bio.seek(0)
+    photo = BufferedInputFile(bio.getvalue(), filename="goodbye.png")
     
     # Send goodbye card
     caption = f"""
@@ -314,7 +317,7 @@ We hope to see you again soon! 💙
     
     await bot.bot.send_photo(
         chat.id,
-        bio,
+        photo,
         caption=caption.strip(),
         parse_mode='HTML'
     )
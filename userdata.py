@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+User Data Tool - Bulk import/export of the users table as NDJSON or CSV
+
+    python userdata.py export users.ndjson
+    python userdata.py export users.csv --banned no
+    python userdata.py import users.ndjson --chunk-size 20000
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Iterator, Optional
+
+from core.database import Database, UserRecord
+from core.utils import load_config
+
+FLAG_FIELDS = ('is_admin', 'is_banned', 'is_pro')
+
+def detect_format(path: str, fmt: Optional[str]) -> str:
+    """Pick the file format from --format or the file extension"""
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+def open_file(path: str, mode: str):
+    """Open a file, with '-' meaning stdin/stdout"""
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    return open(path, mode, newline='' if path.lower().endswith('.csv') else None, encoding='utf-8')
+
+def to_row(record: dict) -> tuple:
+    """Convert an imported record into a users row ordered like UserRecord.FIELDS"""
+    row = []
+    for field in UserRecord.FIELDS:
+        value = record.get(field)
+        if value == '':
+            value = None
+
+        if field == 'id':
+            value = int(value)
+        elif field in FLAG_FIELDS:
+            value = 1 if value in (True, 1, '1', 'true', 'True') else 0
+
+        row.append(value)
+    return tuple(row)
+
+def read_records(handle, fmt: str) -> Iterator[dict]:
+    """Stream records from an NDJSON or CSV file"""
+    if fmt == 'csv':
+        yield from csv.DictReader(handle)
+        return
+
+    for line in handle:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def export_users(database: Database, path: str, fmt: str, banned: Optional[bool], batch_size: int) -> int:
+    """Stream users out through the keyset cursor"""
+    count = 0
+    handle = open_file(path, 'w')
+
+    try:
+        if fmt == 'csv':
+            writer = csv.writer(handle)
+            writer.writerow(UserRecord.FIELDS)
+            for record in database.iter_users(batch_size=batch_size, banned=banned):
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in database.iter_users(batch_size=batch_size, banned=banned):
+                handle.write(json.dumps(record.to_dict(), ensure_ascii=False) + '\n')
+                count += 1
+    finally:
+        if handle is not sys.stdout:
+            handle.close()
+
+    return count
+
+def import_users(database: Database, path: str, fmt: str, chunk_size: int) -> int:
+    """Stream users in with chunked executemany"""
+    handle = open_file(path, 'r')
+
+    try:
+        rows = (to_row(record) for record in read_records(handle, fmt))
+        return database.import_users(rows, chunk_size=chunk_size)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def main():
+    config = load_config()
+
+    parser = argparse.ArgumentParser(description="Bulk import/export of bot users")
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('path', help="NDJSON/CSV file, or - for stdin/stdout")
+    parser.add_argument('--db', default=config.get('database', 'bot.db'), help="SQLite database path")
+    parser.add_argument('--format', choices=['ndjson', 'csv'], help="Defaults to the file extension")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per import transaction")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Rows per export page")
+    parser.add_argument('--banned', choices=['yes', 'no'], help="Export only banned / not banned users")
+    args = parser.parse_args()
+
+    database = Database(args.db, config.get('sqlite', {}))
+    fmt = detect_format(args.path, args.format)
+    banned = None if args.banned is None else args.banned == 'yes'
+
+    start = time.perf_counter()
+    if args.action == 'export':
+        count = export_users(database, args.path, fmt, banned, args.batch_size)
+    else:
+        count = import_users(database, args.path, fmt, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    database.close()
+
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"{args.action.title()}ed {count:,} users in {elapsed:.2f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
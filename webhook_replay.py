@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Webhook Replay - POST recorded updates to a locally running webhook server
+
+    python webhook_replay.py updates.ndjson
+    python webhook_replay.py updates.ndjson --repeat 100 --concurrency 32
+    python webhook_replay.py updates.ndjson --url http://127.0.0.1:8080/webhook --secret s3cret
+
+Record real traffic with "record_path" in the webhook config, then run the bot with
+mode "webhook" and an empty "url" so it serves locally without calling setWebhook.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from typing import List
+
+import aiohttp
+
+from core.utils import load_config
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+def read_updates(path: str) -> List[dict]:
+    """Load updates from an NDJSON file or a JSON array"""
+    handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        text = handle.read()
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def replay(url: str, updates: List[dict], secret: str, concurrency: int, repeat: int):
+    """POST every update (repeat times, with fresh update_ids) and collect status and latency"""
+    headers = {'Content-Type': 'application/json'}
+    if secret:
+        headers[SECRET_HEADER] = secret
+
+    bodies = []
+    update_id = 1
+    for _ in range(repeat):
+        for update in updates:
+            bodies.append(json.dumps(dict(update, update_id=update_id)))
+            update_id += 1
+
+    statuses = Counter()
+    latencies = []
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def sender(session: aiohttp.ClientSession):
+        while not queue.empty():
+            body = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                async with session.post(url, data=body, headers=headers) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except aiohttp.ClientError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return statuses, sorted(latencies), elapsed
+
+def main():
+    config = load_config()
+    webhook = config.get('webhook', {})
+    default_url = f"http://127.0.0.1:{webhook.get('port', 8080)}{webhook.get('path', '/webhook')}"
+
+    parser = argparse.ArgumentParser(description="Replay recorded updates against a local webhook server")
+    parser.add_argument('path', help="NDJSON or JSON array of updates, or - for stdin")
+    parser.add_argument('--url', default=default_url, help="Webhook URL to POST to")
+    parser.add_argument('--secret', default=webhook.get('secret_token', ''), help="Secret token header value")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight at once")
+    parser.add_argument('--repeat', type=int, default=1, help="Send the whole file this many times")
+    args = parser.parse_args()
+
+    updates = read_updates(args.path)
+    statuses, latencies, elapsed = asyncio.run(
+        replay(args.url, updates, args.secret, args.concurrency, args.repeat)
+    )
+
+    count = len(latencies)
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Sent {count:,} updates in {elapsed:.2f}s ({rate:,.0f} updates/sec)", file=sys.stderr)
+    print(f"Status: {dict(statuses)}", file=sys.stderr)
+    print(f"Latency: p50 {percentile(latencies, 0.5):.2f}ms, p99 {percentile(latencies, 0.99):.2f}ms, "
+          f"max {latencies[-1] if latencies else 0:.2f}ms", file=sys.stderr)
+
+    if set(statuses) - {200}:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()